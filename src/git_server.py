@@ -1,7 +1,58 @@
 #!/usr/bin/env python3
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from contextlib import contextmanager
+from contextlib import nullcontext
+from datetime import datetime
+from fcntl import LOCK_EX
+from fcntl import LOCK_NB
+from fcntl import LOCK_SH
+from fcntl import LOCK_UN
+from fcntl import flock
+from hashlib import sha256
+from json import dump as json_dump
+from json import load as json_load
+from os import O_CREAT
+from os import O_NOFOLLOW
+from os import O_RDWR
+from os import close
+from os import ftruncate
+from os import getuid
+from os import lstat
+from os import makedirs
+from os import open as os_open
+from os import pread
+from os import pwrite
+from os import remove
+from os import replace
+from os import utime
+from os import walk
+from os.path import abspath
+from os.path import dirname
+from os.path import expanduser
+from os.path import getmtime
+from os.path import getsize
+from os.path import isdir
+from os.path import isfile
+from os.path import join
 from re import compile
+from shutil import copyfileobj
+from shutil import rmtree
+from shlex import quote
+from stat import S_ISDIR
+from subprocess import PIPE
+from subprocess import Popen
 from subprocess import run
+from sys import stderr
+from sys import stdout as std_out
+from tempfile import TemporaryDirectory
+from tempfile import TemporaryFile
+from threading import Lock
+from threading import Semaphore
+from time import sleep
+from time import time
+from uuid import uuid4
 
 EXIT_SUCCESS = 0
 
@@ -19,6 +70,31 @@ EXIT_ERROR_DELETE_REPO_EXCEPTION = 11
 EXIT_ERROR_LIST_REPOS_EXCEPTION = 12
 EXIT_ERROR_PROXY_REPO_EXCEPTION = 13
 EXIT_ERROR_SSH_INVALID_KEY = 14
+EXIT_ERROR_MANIFEST_INVALID = 15
+EXIT_ERROR_MANIFEST_EXCEPTION = 16
+EXIT_ERROR_MANIFEST_APPLY_FAILED = 17
+EXIT_ERROR_REFRESH_FAILED = 18
+EXIT_ERROR_REFRESH_EXCEPTION = 19
+EXIT_ERROR_GREP_EXCEPTION = 20
+EXIT_ERROR_MIGRATE_INVALID = 21
+EXIT_ERROR_MIGRATE_FAILED = 22
+EXIT_ERROR_MIGRATE_EXCEPTION = 23
+EXIT_ERROR_POOL_INVALID = 24
+EXIT_ERROR_POOL_IN_USE = 25
+EXIT_ERROR_CLONE_CACHED_INVALID = 26
+EXIT_ERROR_CLONE_CACHED_EXCEPTION = 27
+EXIT_ERROR_QUEUE_FLUSH_FAILED = 28
+EXIT_ERROR_QUEUE_EXCEPTION = 29
+EXIT_ERROR_PROFILE_INVALID = 30
+EXIT_ERROR_PROFILE_EXCEPTION = 31
+EXIT_ERROR_LIST_QUERY_INVALID = 32
+EXIT_ERROR_BACKUP_FAILED = 33
+EXIT_ERROR_BACKUP_EXCEPTION = 34
+EXIT_ERROR_RESTORE_FAILED = 35
+EXIT_ERROR_RESTORE_EXCEPTION = 36
+EXIT_ERROR_ARCHIVE_FAILED = 37
+EXIT_ERROR_ARCHIVE_EXCEPTION = 38
+EXIT_ERROR_RENAME_REPO_INVALID = 39
 
 EXIT_UNDEFINED_ERROR = 253
 EXIT_UNSPECIFIED_ERROR = 254
@@ -26,6 +102,34 @@ EXIT_INTERNAL_ERROR_INVALID_CMD = 255
 
 REQUIRE_NO_PARAMETERS = {}
 PREFERRED_SERVER_KEY = "core.preferredGitserver"
+SSH_COMMAND = "ssh -o 'StrictHostKeyChecking no'"
+SSH_MULTIPLEX_OPTIONS = "-o ControlMaster=auto " \
+                        "-o ControlPath=~/.cache/git-tools/ssh-%C " \
+                        "-o ControlPersist=60"
+REPO_BASE_PATH = "/git/repos/"
+POOL_PREFIX = "pools/"
+CACHE_BUDGET_KEY = "core.gitToolsCacheBudget"
+DEFAULT_CACHE_BUDGET = 10 * 1024 ** 3
+QUEUE_FILE = "queue.json"
+INDEX_FILE = "index.json"
+INDEX_TTL = 3600
+INDEX_COLUMNS = ["name", "size", "packs", "pushed", "branch", "refs"]
+SSH_SESSIONS_KEY = "core.gitToolsMaxSshSessions"
+DEFAULT_SSH_SESSIONS = 8
+SSH_SLOT_POLL_INTERVAL = 0.05
+SSH_SLOT_DIR = "ssh-slots"
+BACKUP_MANIFEST_FILE = "manifest.json"
+ARCHIVE_MANIFEST_FILE = "SHA256SUMS"
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+DEFAULT_JOBS = 4
+DEFAULT_HOST_JOBS = 2
+CACHE_DIR = "~/.cache/git-tools"
+MIRROR_STATE_FILE = "mirrors.json"
+MIRROR_MIN_INTERVAL = 300
+MIRROR_DEFAULT_INTERVAL = 3600
+MIRROR_MAX_INTERVAL = 86400
+DEFAULT_REV = "HEAD"
+DEFAULT_MAX_PER_REPO = 100
 
 CMD_AUTHORIZE = "authorize"
 CMD_AUTHORIZED = "authorized"
@@ -35,17 +139,92 @@ CMD_LIST = "list"
 CMD_PROXY = "proxy"
 CMD_RENAME = "rename"
 CMD_USE = "use"
+CMD_APPLY_MANIFEST = "apply-manifest"
+CMD_REFRESH = "refresh"
+CMD_GREP_ALL = "grep-all"
+CMD_MIGRATE = "migrate"
+CMD_CLONE_CACHED = "clone-cached"
+CMD_QUEUE_STATUS = "queue-status"
+CMD_QUEUE_FLUSH = "queue-flush"
+CMD_PROFILE = "profile"
+CMD_BACKUP_ALL = "backup-all"
+CMD_RESTORE_ALL = "restore-all"
+CMD_ARCHIVE_ALL = "archive-all"
+
+SERVER_CMD_MIRROR_PUSH = "mirror-push"
+SERVER_CMD_POOL_MEMBERS = "pool-members"
+SERVER_CMD_CONFIG = "config"
+SERVER_CMD_PROXIES = "proxies"
+
+"""
+    REPO_PROFILES:
+        Named server-side repository config templates applied by
+        'git create --profile' and 'git profile'.  All of them enable
+        commit-graphs and partial clone (uploadpack.allowFilter);
+        larger profiles add reachability bitmaps, multi-pack indexes
+        and a lower big file threshold.
+"""
+REPO_PROFILES = {
+    "small": {
+        "core.commitGraph": "true",
+        "gc.writeCommitGraph": "true",
+        "pack.threads": "1",
+        "uploadpack.allowFilter": "true",
+    },
+    "large": {
+        "core.bigFileThreshold": "64m",
+        "core.commitGraph": "true",
+        "gc.writeCommitGraph": "true",
+        "pack.threads": "0",
+        "pack.useBitmaps": "true",
+        "pack.writeBitmapHashCache": "true",
+        "repack.writeBitmaps": "true",
+        "uploadpack.allowFilter": "true",
+    },
+    "monorepo": {
+        "core.bigFileThreshold": "16m",
+        "core.commitGraph": "true",
+        "core.multiPackIndex": "true",
+        "gc.writeCommitGraph": "true",
+        "maintenance.strategy": "incremental",
+        "pack.threads": "0",
+        "pack.useBitmaps": "true",
+        "pack.writeBitmapHashCache": "true",
+        "repack.writeBitmaps": "true",
+        "uploadpack.allowFilter": "true",
+        "uploadpack.allowSidebandAll": "true",
+    },
+}
+
+PLAN_CREATE = "create"
+PLAN_DELETE = "delete"
+PLAN_RENAME = "rename"
 
 help_text = """
 Usage:
-    git authorize <ssh_key> [--debug]
+    git authorize <ssh_key> [--queue] [--debug]
     git authorized [--debug]
-    git create <repo> [--debug]
-    git delete <repo> [--debug]
-    git list [--debug]
-    git proxy <git ssh repo url> [--debug]
-    git rename <old_repo_name> <new_repo_name> [--debug]
+    git create <repo> [--pool <pool>] [--profile <profile>] [--queue]
+               [--debug]
+    git delete <repo> [--queue] [--debug]
+    git list [--sort name|size|packs|pushed|refs] [--older-than <age>]
+             [--larger-than <size>] [--limit <n>] [--refresh] [--debug]
+    git proxy <git ssh repo url> [--pool <pool>] [--debug]
+    git rename <old_repo_name> <new_repo_name> [--queue] [--debug]
     git use <server> [--debug]
+    git apply-manifest <manifest.(json|yaml)> [--plan] [--jobs <n>] [--debug]
+    git refresh [--force] [--jobs <n>] [--host-jobs <n>] [--debug]
+    git grep-all <pattern> [--prefix <p>] [--rev <rev>]
+                 [--max-per-repo <n>] [--limit <n>] [--debug]
+    git migrate --to <server> [prefix] [--jobs <n>] [--force] [--debug]
+    git clone-cached <repo> [<directory>] [--debug]
+    git queue status|flush [--debug]
+    git profile <repo> [small|large|monorepo] [--queue] [--debug]
+    git backup-all <directory> [--prefix <p>] [--jobs <n>] [--debug]
+    git restore-all <directory> [--prefix <p>] [--jobs <n>] [--force]
+                    [--debug]
+    git archive-all [prefix] --out <directory|-> [--rev <rev>] [--jobs <n>]
+                    [--checksums <file>] [--debug]
 """
 
 
@@ -93,7 +272,10 @@ class GitServer(object):
         "required_repo": 105,
         "required_source": 106,
         "required_destination": 107,
-        "required_server": 107
+        "required_server": 107,
+        "required_manifest": 108,
+        "required_pattern": 109,
+        "required_directory": 110
     }
     """
         __disallowed_git_servers:
@@ -129,7 +311,18 @@ class GitServer(object):
                 CMD_LIST,
                 CMD_PROXY,
                 CMD_RENAME,
-                CMD_USE
+                CMD_USE,
+                CMD_APPLY_MANIFEST,
+                CMD_REFRESH,
+                CMD_GREP_ALL,
+                CMD_MIGRATE,
+                CMD_CLONE_CACHED,
+                CMD_QUEUE_STATUS,
+                CMD_QUEUE_FLUSH,
+                CMD_PROFILE,
+                CMD_BACKUP_ALL,
+                CMD_RESTORE_ALL,
+                CMD_ARCHIVE_ALL
             ],
             help="Git Tools Command")
 
@@ -170,6 +363,148 @@ class GitServer(object):
             default="",
             help="specify a git server")
 
+        parser.add_argument(
+            "--manifest",
+            type=str,
+            required=False,
+            default="",
+            help="specify a repository manifest file (json or yaml)")
+
+        parser.add_argument(
+            "--checksums",
+            type=str,
+            required=False,
+            default="",
+            help="file to write the SHA256SUMS of archive-all to")
+
+        parser.add_argument(
+            "--plan",
+            required=False,
+            default=False,
+            action="store_true",
+            help="show the manifest plan without applying it")
+
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            required=False,
+            default=DEFAULT_JOBS,
+            help="maximum number of concurrent server operations")
+
+        parser.add_argument(
+            "--host-jobs",
+            dest="host_jobs",
+            type=int,
+            required=False,
+            default=DEFAULT_HOST_JOBS,
+            help="maximum number of concurrent fetches per upstream host")
+
+        parser.add_argument(
+            "--force",
+            required=False,
+            default=False,
+            action="store_true",
+            help="refresh all proxied repositories, even if not due "
+                 "(refresh), or overwrite existing repositories which "
+                 "differ (restore-all, migrate)")
+
+        parser.add_argument(
+            "--pattern",
+            type=str,
+            required=False,
+            default="",
+            help="specify a search pattern")
+
+        parser.add_argument(
+            "--prefix",
+            type=str,
+            required=False,
+            default="",
+            help="only consider repositories starting with this prefix")
+
+        parser.add_argument(
+            "--rev",
+            type=str,
+            required=False,
+            default=DEFAULT_REV,
+            help="specify a revision (default: HEAD)")
+
+        parser.add_argument(
+            "--max-per-repo",
+            dest="max_per_repo",
+            type=int,
+            required=False,
+            default=DEFAULT_MAX_PER_REPO,
+            help="maximum number of matches reported per repository")
+
+        parser.add_argument(
+            "--limit",
+            type=int,
+            required=False,
+            default=0,
+            help="stop after this many results (0: unlimited)")
+
+        parser.add_argument(
+            "--pool",
+            type=str,
+            required=False,
+            default="",
+            help="share objects with an object pool (git alternates)")
+
+        parser.add_argument(
+            "--directory",
+            type=str,
+            required=False,
+            default="",
+            help="specify a local directory")
+
+        parser.add_argument(
+            "--queue",
+            required=False,
+            default=False,
+            action="store_true",
+            help="queue the change locally if the server is unreachable")
+
+        parser.add_argument(
+            "--profile",
+            type=str,
+            required=False,
+            default="",
+            help="specify a repository config profile "
+                 f"({'|'.join(REPO_PROFILES)})")
+
+        parser.add_argument(
+            "--sort",
+            type=str,
+            required=False,
+            default="",
+            choices=["", "name", "size", "packs", "pushed", "refs"],
+            help="sort the repository list")
+
+        parser.add_argument(
+            "--older-than",
+            dest="older_than",
+            type=str,
+            required=False,
+            default="",
+            help="only list repositories not pushed to for this long "
+                 "(e.g. 365d, 12w, 6h)")
+
+        parser.add_argument(
+            "--larger-than",
+            dest="larger_than",
+            type=str,
+            required=False,
+            default="",
+            help="only list repositories larger than this (e.g. 1g, 500m)")
+
+        parser.add_argument(
+            "--refresh",
+            required=False,
+            default=False,
+            action="store_true",
+            help="refresh the local repository metadata index")
+
         parser.add_argument(
             "--global",
             dest="scope",
@@ -187,7 +522,13 @@ class GitServer(object):
         )
 
         self.args = parser.parse_args()
+        # 'git archive-all --out -' writes the archives to stdout, so
+        # debug and error output goes to stderr
+        self.debug_output = stderr \
+            if self.args.command == CMD_ARCHIVE_ALL and \
+            self.args.directory.strip() == "-" else std_out
         self.debug("Commandline arguments processed.")
+        self.__ssh_sessions = {}
 
     def debug(self, msg: str) -> None:
         """
@@ -197,7 +538,7 @@ class GitServer(object):
             :return: None
         """
         if self.args.debug:
-            print(f"[DEBUG]: {msg}")
+            print(f"[DEBUG]: {msg}", file=self.debug_output)
 
     @staticmethod
     def __valid_server_name(server_name: str) -> bool:
@@ -268,24 +609,309 @@ class GitServer(object):
         except Exception as e:
             return EXIT_ERROR_LOCAL_GIT_COMMAND, f"{e}"
 
+    def __max_ssh_sessions(self, server: str) -> int:
+        """
+            Return the maximum number of concurrent ssh sessions to a
+            server on this host (gitTools.<server>.maxSshSessions,
+            falling back to core.gitToolsMaxSshSessions).  Zero or less
+            disables the limit.
+
+            :param server: str
+            :return: int
+        """
+        if server not in self.__ssh_sessions:
+            limit = DEFAULT_SSH_SESSIONS
+            for key in (f"gitTools.{server}.maxSshSessions",
+                        SSH_SESSIONS_KEY):
+                exit_code, stdout = self.runner(
+                    f"git config --type=int --get {quote(key)}")
+                if exit_code == 0 and stdout != "":
+                    limit = int(stdout)
+                    break
+            self.__ssh_sessions[server] = limit
+        return self.__ssh_sessions[server]
+
+    @staticmethod
+    def __lock_file(path: str) -> int:
+        """
+            Open (and create) a lock file, refusing to follow symlinks.
+
+            :param path: str
+            :return: int (file descriptor)
+        """
+        return os_open(path, O_RDWR | O_CREAT | O_NOFOLLOW, 0o600)
+
+    def __lock_dir(self, server: str) -> str:
+        """
+            Return (and create) the per-user directory holding the ssh
+            session lock files of a server.  The directory must be a
+            real directory owned by the current user.
+
+            :param server: str
+            :return: str (path)
+        """
+        path = join(self.cache_dir(server), SSH_SLOT_DIR)
+        makedirs(path, mode=0o700, exist_ok=True)
+        st = lstat(path)
+        if not S_ISDIR(st.st_mode) or st.st_uid != getuid():
+            raise OSError(f"lock directory '{path}' is not a directory "
+                          f"owned by the current user")
+        return path
+
+    @staticmethod
+    def __read_tickets(fd: int) -> (int, int):
+        """
+            Read the ticket counters (next ticket, ticket being served)
+            of an ssh slot queue.
+
+            :param fd: int (locked turnstile file)
+            :return: int (next ticket), int (serving)
+        """
+        fields = pread(fd, 64, 0).decode().split()
+        if len(fields) != 2:
+            return 0, 0
+        return int(fields[0]), int(fields[1])
+
+    @staticmethod
+    def __write_tickets(fd: int, next_ticket: int, serving: int) -> None:
+        """
+            Write the ticket counters of an ssh slot queue.
+
+            :param fd: int (locked turnstile file)
+            :param next_ticket: int
+            :param serving: int
+            :return: None
+        """
+        ftruncate(fd, 0)
+        pwrite(fd, f"{next_ticket} {serving}\n".encode(), 0)
+
+    @staticmethod
+    def __skip_abandoned(lock_dir: str, serving: int, ticket: int) -> int:
+        """
+            Advance past the tickets ahead of ours whose holders are
+            gone (killed while waiting): a live waiter keeps its ticket
+            file locked.  The caller must hold the turnstile lock.
+
+            :param lock_dir: str
+            :param serving: int
+            :param ticket: int (our ticket)
+            :return: int (new serving)
+        """
+        while serving < ticket:
+            path = join(lock_dir, f"ticket-{serving}.lock")
+            try:
+                fd = os_open(path, O_RDWR | O_NOFOLLOW)
+            except FileNotFoundError:
+                serving += 1
+                continue
+            try:
+                flock(fd, LOCK_EX | LOCK_NB)
+            except OSError:
+                return serving
+            finally:
+                close(fd)
+            remove(path)
+            serving += 1
+        return serving
+
+    def __free_slot(self, lock_dir: str, limit: int) -> int:
+        """
+            Lock the first free ssh slot, if any.
+
+            :param lock_dir: str
+            :param limit: int
+            :return: int (file descriptor of the locked slot) or None
+        """
+        for i in range(limit):
+            fd = self.__lock_file(join(lock_dir, f"slot-{i}.lock"))
+            try:
+                flock(fd, LOCK_EX | LOCK_NB)
+                return fd
+            except OSError:
+                close(fd)
+        return None
+
+    @contextmanager
+    def ssh_slot(self, server: str):
+        """
+            Hold one of the ssh session slots of a server while an ssh
+            command runs, so that concurrent git-tools invocations
+            (e.g. CI jobs) of the current user do not exceed the
+            server's sshd capacity (MaxStartups).  The slots are lock
+            files shared by all processes of the user.  Waiters draw a
+            ticket and are served in ticket order (first come, first
+            served); a counter file updated under a turnstile lock
+            holds the next ticket and the ticket being served.
+
+            :param server: str
+        """
+        limit = self.__max_ssh_sessions(server)
+        if limit <= 0:
+            yield
+            return
+        lock_dir = self.__lock_dir(server)
+        started = time()
+        slot = None
+        ticket_fd = None
+        turnstile = self.__lock_file(join(lock_dir, "queue.lock"))
+        try:
+            flock(turnstile, LOCK_EX)
+            try:
+                next_ticket, serving = self.__read_tickets(turnstile)
+                ticket = next_ticket
+                ticket_path = join(lock_dir, f"ticket-{ticket}.lock")
+                ticket_fd = self.__lock_file(ticket_path)
+                flock(ticket_fd, LOCK_EX)
+                self.__write_tickets(turnstile, ticket + 1, serving)
+            finally:
+                flock(turnstile, LOCK_UN)
+            while slot is None:
+                flock(turnstile, LOCK_EX)
+                try:
+                    next_ticket, serving = self.__read_tickets(turnstile)
+                    serving = self.__skip_abandoned(lock_dir, serving,
+                                                    ticket)
+                    if serving >= ticket:
+                        slot = self.__free_slot(lock_dir, limit)
+                        if slot is not None:
+                            serving = max(serving, ticket + 1)
+                    self.__write_tickets(turnstile, next_ticket, serving)
+                finally:
+                    flock(turnstile, LOCK_UN)
+                if slot is None:
+                    sleep(SSH_SLOT_POLL_INTERVAL)
+            self.debug(f"ssh slot on '{server}' (limit {limit}) acquired "
+                       f"after {time() - started:.3f}s")
+        finally:
+            close(turnstile)
+            if ticket_fd is not None:
+                # an unserved ticket is skipped once its lock is released
+                close(ticket_fd)
+                if slot is not None:
+                    remove(ticket_path)
+        try:
+            yield
+        finally:
+            flock(slot, LOCK_UN)
+            close(slot)
+
     def ssh_runner(self,
                    server: str,
-                   command: str) -> (int, str):
+                   command: str,
+                   options: str = "") -> (int, str):
         """
             Execute an ssh command against the remote git server.
 
             :param server: str
             :param command: str
+            :param options: str (additional ssh options, default: "")
             :return: int(exit_code), str(stdout)
         """
         try:
-            cmd = "ssh -o 'StrictHostKeyChecking no' " + \
-                  f"git@{server} {command}"
+            cmd = f"{SSH_COMMAND} {options}".strip() + \
+                f" git@{server} {command}"
             self.debug(f"command(ssh_runner): {cmd}")
-            return self.runner(cmd)
+            with self.ssh_slot(server):
+                return self.runner(cmd)
+        except Exception as e:
+            return EXIT_ERROR_SSH_GIT_COMMAND, f"{e}"
+
+    def ssh_stream(self, server: str, command: str,
+                   on_line) -> (int, str):
+        """
+            Execute an ssh command against the remote git server and
+            pass each line of output to on_line() as it arrives.  If
+            on_line() returns False, the command is terminated early.
+
+            :param server: str
+            :param command: str
+            :param on_line: function(str) -> bool
+            :return: int(exit_code), str(stderr)
+        """
+        try:
+            cmd = f"{SSH_COMMAND} git@{server} {command}"
+            self.debug(f"command(ssh_stream): {cmd}")
+            # stderr goes to a file: a full stderr pipe would block the
+            # command while stdout is being read
+            with self.ssh_slot(server), TemporaryFile() as errors:
+                process = Popen(cmd, shell=True, stdout=PIPE, stderr=errors)
+                stopped = False
+                for line in process.stdout:
+                    if not on_line(line.decode().rstrip("\n")):
+                        stopped = True
+                        process.terminate()
+                        break
+                process.stdout.close()
+                exit_code = process.wait()
+                errors.seek(0)
+                stderr = errors.read().decode().strip()
+            if stopped:
+                self.debug("command(ssh_stream) terminated early")
+                return EXIT_SUCCESS, ""
+            return exit_code, stderr
+        except Exception as e:
+            return EXIT_ERROR_SSH_GIT_COMMAND, f"{e}"
+
+    def remote_git(self, server: str, args: str) -> (int, str):
+        """
+            Execute a local git command which talks to a git server
+            over ssh (e.g. ls-remote, clone, push) while holding one of
+            the server's ssh session slots.
+
+            :param server: str
+            :param args: str
+            :return: int(exit_code), str(stdout)
+        """
+        try:
+            with self.ssh_slot(server):
+                return self.runner(f"GIT_SSH_COMMAND={quote(SSH_COMMAND)} "
+                                   f"git {args}")
         except Exception as e:
             return EXIT_ERROR_SSH_GIT_COMMAND, f"{e}"
 
+    @staticmethod
+    def repo_url(server: str, repo: str) -> str:
+        """
+            Return the ssh url of a repository on a git server.
+
+            :param server: str
+            :param repo: str
+            :return: str
+        """
+        return f"git@{server}:{REPO_BASE_PATH}{repo}"
+
+    def ref_tips(self, server: str, repo: str) -> (int, dict):
+        """
+            Return the ref tips of a repository on a git server as
+            {ref: sha}.
+
+            :param server: str
+            :param repo: str
+            :return: int(exit_code), dict (ref tips) or str (error)
+        """
+        exit_code, stdout = self.remote_git(
+            server, f"ls-remote {quote(self.repo_url(server, repo))}")
+        if exit_code != 0:
+            return exit_code, stdout
+        tips = {}
+        for line in stdout.split("\n"):
+            if "\t" in line:
+                sha, ref = line.split("\t", 1)
+                tips[ref] = sha
+        return exit_code, tips
+
+    @staticmethod
+    def own_refs(tips: dict) -> dict:
+        """
+            Return the refs/* entries of a ref tips dict, without HEAD
+            and peeled tags (which a mirror push does not reproduce).
+
+            :param tips: dict
+            :return: dict
+        """
+        return {ref: sha for ref, sha in tips.items()
+                if ref.startswith("refs/") and not ref.endswith("^{}")}
+
     def __get_server(self, this_scope: bool = False) -> (int, str):
         """
             return the preferred git server
@@ -372,8 +998,9 @@ class GitServer(object):
                 return exit_code, stdout
             server = stdout
             cmd = f"authorize --sshkey '{ssh_key}'"
-            exit_code, stdout = self.ssh_runner(server=server,
-                                                command=cmd)
+            exit_code, stdout = self.__mutation_runner(server=server,
+                                                       command=cmd,
+                                                       repos=[])
             if exit_code == 255:
                 return 255, "connection failed (unauthorized)"
             else:
@@ -406,13 +1033,335 @@ class GitServer(object):
         else:
             return exit_code, stdout
 
+    def __queue_file(self, server: str) -> str:
+        """
+            Return the path of the offline mutation queue of a server.
+
+            :param server: str
+            :return: str (path)
+        """
+        return join(self.cache_dir(server), QUEUE_FILE)
+
+    def __load_queue(self, server: str) -> list:
+        """
+            Load the pending mutations queued for a server.
+
+            :param server: str
+            :return: list
+        """
+        path = self.__queue_file(server)
+        if not isfile(path):
+            return []
+        with open(path, "r") as f:
+            return json_load(f)
+
+    def __save_queue(self, server: str, queue: list) -> None:
+        """
+            Atomically save the pending mutations queued for a server.
+
+            :param server: str
+            :param queue: list
+            :return: None
+        """
+        path = self.__queue_file(server)
+        with open(f"{path}.tmp", "w") as f:
+            json_dump(queue, f, indent=2)
+        replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def coalesce(queue: list, command: str, repos: list) -> None:
+        """
+            Append a mutation to the queue, unless it cancels out or
+            repeats the last queued mutation of the same repositories:
+            a delete following a create of the same repo removes both,
+            and a repeated identical mutation is only kept once.
+
+            :param queue: list
+            :param command: str
+            :param repos: list
+            :return: None
+        """
+        last = None
+        for entry in reversed(queue):
+            if set(entry["repos"]) & set(repos) or \
+                    (len(repos) == 0 and entry["command"] == command):
+                last = entry
+                break
+        if last is not None:
+            if last["command"] == command:
+                return
+            if command.split()[0] == CMD_DELETE and \
+                    last["command"].split()[0] == CMD_CREATE and \
+                    last["repos"] == repos:
+                queue.remove(last)
+                return
+        queue.append({
+            "key": uuid4().hex,
+            "command": command,
+            "repos": repos,
+            "queued_at": time()
+        })
+
+    def __flush_queue(self, server: str, queue: list) -> (int, list):
+        """
+            Send the queued mutations to the server in order, over one
+            multiplexed ssh connection.  Each mutation is removed from
+            the queue (by idempotency key) as soon as the server has
+            answered it, so an interrupted flush never replays it.
+            Flushing stops while the server is unreachable.  The caller
+            must hold the queue lock.
+
+            :param server: str
+            :param queue: list (updated in place)
+            :return: int (exit_code), list (per-mutation results)
+        """
+        results = []
+        failures = 0
+        while len(queue) > 0:
+            entry = queue[0]
+            exit_code, stdout = self.ssh_runner(
+                server=server, command=entry["command"],
+                options=SSH_MULTIPLEX_OPTIONS)
+            if exit_code == 255:
+                self.debug(f"queue: '{server}' still unreachable")
+                return 255, results
+            queue[:] = [e for e in queue if e["key"] != entry["key"]]
+            self.__save_queue(server, queue)
+            if exit_code == 0:
+                results.append(f"  [ok]     {entry['command']}")
+            else:
+                failures += 1
+                results.append(f"  [failed] {entry['command']} "
+                               f"({exit_code}): {stdout}")
+        if failures > 0:
+            return EXIT_ERROR_QUEUE_FLUSH_FAILED, results
+        return EXIT_SUCCESS, results
+
+    def __mutation_runner(self, server: str, command: str,
+                          repos: list) -> (int, str):
+        """
+            Execute a (validated) mutation on the server.  Pending
+            mutations are flushed first (their results precede the
+            output), so that ordering is preserved; while any remain
+            pending the mutation is not run.  With --queue, it is then
+            queued locally instead of failing, as it is when the server
+            is unreachable.
+
+            :param server: str
+            :param command: str
+            :param repos: list (repositories touched by the mutation)
+            :return: int (exit_code), str (stdout)
+        """
+        if not self.args.queue and not isfile(self.__queue_file(server)):
+            return self.ssh_runner(server=server, command=command)
+        with open(f"{self.__queue_file(server)}.lock", "a") as lock:
+            flock(lock, LOCK_EX)
+            queue = self.__load_queue(server)
+            flushed = []
+            if len(queue) > 0:
+                exit_code, results = self.__flush_queue(server, queue)
+                if len(results) > 0:
+                    flushed = [f"flushed {len(results)} queued "
+                               f"mutation(s) for '{server}':"] + results
+            if len(queue) == 0:
+                exit_code, stdout = self.ssh_runner(server=server,
+                                                    command=command)
+                if exit_code != 255 or not self.args.queue:
+                    return exit_code, \
+                        "\n".join(flushed + [stdout]).rstrip()
+            elif not self.args.queue:
+                return 255, "\n".join(
+                    flushed + [f"'{server}' is unreachable and has "
+                               f"{len(queue)} older mutation(s) queued; "
+                               "not run (use --queue)"])
+            self.coalesce(queue, command, repos)
+            self.__save_queue(server, queue)
+        return EXIT_SUCCESS, "\n".join(
+            flushed + [f"'{server}' is unreachable; queued "
+                       f"({len(queue)} pending, see 'git queue status')"])
+
+    def queue_status(self, search_scope: bool = False) -> (int, str):
+        """
+            Show the mutations queued for the preferred server.
+
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (queued mutations)
+        """
+        try:
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(queue): {stdout}"
+            server = stdout
+            queue = self.__load_queue(server)
+            now = time()
+            lines = [f"{len(queue)} mutation(s) queued for '{server}'"]
+            for entry in queue:
+                age = self.format_age(now - entry["queued_at"])
+                lines.append(f"  {entry['key'][:8]} {age:>7} ago  "
+                             f"{entry['command']}")
+            return EXIT_SUCCESS, "\n".join(lines)
+        except Exception as e:
+            return EXIT_ERROR_QUEUE_EXCEPTION, \
+                f"could not read the mutation queue. {e}"
+
+    def queue_flush(self, search_scope: bool = False) -> (int, str):
+        """
+            Send the mutations queued for the preferred server.
+
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-mutation results)
+        """
+        try:
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(queue): {stdout}"
+            server = stdout
+            with open(f"{self.__queue_file(server)}.lock", "a") as lock:
+                flock(lock, LOCK_EX)
+                queue = self.__load_queue(server)
+                exit_code, results = self.__flush_queue(server, queue)
+            lines = results + [f"{len(queue)} mutation(s) still queued "
+                               f"for '{server}'"]
+            if exit_code == 255:
+                lines.append(f"'{server}' is unreachable")
+            return exit_code, "\n".join(lines)
+        except Exception as e:
+            return EXIT_ERROR_QUEUE_EXCEPTION, \
+                f"could not flush the mutation queue. {e}"
+
+    @staticmethod
+    def __profile_options(profile: str) -> (int, str):
+        """
+            Return the '--config key=value' options which apply a
+            repository profile on the git-server (empty if no profile).
+
+            :param profile: str
+            :return: int (exit_code), str (options)
+        """
+        if profile == "":
+            return EXIT_SUCCESS, ""
+        if profile not in REPO_PROFILES:
+            return EXIT_ERROR_PROFILE_INVALID, \
+                f"profile {profile} is not one of " \
+                f"{', '.join(REPO_PROFILES)}"
+        return EXIT_SUCCESS, "".join(
+            f" --config {key}={value}"
+            for key, value in sorted(REPO_PROFILES[profile].items()))
+
+    def profile(self, repo: str, profile: str = "",
+                search_scope: bool = False) -> (int, str):
+        """
+            Apply a repository profile to an existing repository on the
+            preferred server (in one server call), or, without a
+            profile, show how its config compares to each profile.
+
+            :param repo: str
+            :param profile: str (default: "", inspect)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (stdout)
+        """
+        server = ""
+        try:
+            if not self.__valid_repo_name(repo):
+                return EXIT_ERROR_PROFILE_INVALID, f"{repo} is not valid"
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(profile): {stdout}"
+            server = stdout
+            if profile != "":
+                exit_code, stdout = self.__profile_options(profile)
+                if exit_code != 0:
+                    return exit_code, stdout
+                return self.__mutation_runner(
+                    server=server,
+                    command=f"{SERVER_CMD_CONFIG} {repo}{stdout}",
+                    repos=[repo])
+
+            exit_code, stdout = self.ssh_runner(
+                server=server, command=f"{SERVER_CMD_CONFIG} {repo}")
+            if exit_code != 0:
+                return exit_code, stdout
+            current = {}
+            for line in stdout.split("\n"):
+                if "=" in line:
+                    key, value = line.split("=", 1)
+                    current[key.strip().lower()] = value.strip()
+            keys = sorted({key for settings in REPO_PROFILES.values()
+                           for key in settings})
+            width = max(len(key) for key in keys)
+            lines = [f"{'setting':{width}}  {'current':8}  " +
+                     "  ".join(f"{name:8}" for name in REPO_PROFILES)]
+            for key in keys:
+                lines.append(
+                    f"{key:{width}}  {current.get(key.lower(), '-'):8}  " +
+                    "  ".join(f"{settings.get(key, '-'):8}"
+                              for settings in REPO_PROFILES.values()))
+            matching = [name for name, settings in REPO_PROFILES.items()
+                        if all(current.get(key.lower()) == value
+                               for key, value in settings.items())]
+            lines.append(f"matching profile(s): "
+                         f"{', '.join(matching) if matching else 'none'}")
+            return EXIT_SUCCESS, "\n".join(line.rstrip() for line in lines)
+        except Exception as e:
+            return EXIT_ERROR_PROFILE_EXCEPTION, \
+                f"could not apply or inspect profile of ({repo}) " \
+                f"on '{server}'. {e}"
+
+    def __pool_option(self, pool: str) -> (int, str):
+        """
+            Validate an object pool name and return the option passed
+            to the git-server (empty if no pool is used).
+
+            :param pool: str
+            :return: int (exit_code), str (option)
+        """
+        if pool == "":
+            return EXIT_SUCCESS, ""
+        if not self.__valid_repo_name(pool):
+            return EXIT_ERROR_POOL_INVALID, f"pool {pool} is not valid"
+        return EXIT_SUCCESS, f" --pool {pool}"
+
+    def __pool_unused(self, server: str, repo: str) -> (int, str):
+        """
+            Object pools (pools/<pool>) hold the objects borrowed
+            by their members through git alternates.  Deleting or
+            renaming a pool would break its members, so only allow it
+            once no member references the pool any more.
+
+            :param server: str
+            :param repo: str
+            :return: int (exit_code), str (error)
+        """
+        if not repo.startswith(POOL_PREFIX):
+            return EXIT_SUCCESS, ""
+        pool = repo[len(POOL_PREFIX):]
+        exit_code, stdout = self.ssh_runner(
+            server=server, command=f"{SERVER_CMD_POOL_MEMBERS} {pool}")
+        if exit_code != 0:
+            return exit_code, f"could not list members of pool {pool}. " \
+                              f"{stdout}"
+        members = [m for m in stdout.split("\n") if m.strip() != ""]
+        if len(members) > 0:
+            return EXIT_ERROR_POOL_IN_USE, \
+                f"pool {pool} is still used by {len(members)} " \
+                f"repo(s): {', '.join(members[:5])}"
+        return EXIT_SUCCESS, ""
+
     def create_repository(self, repo: str,
-                          search_scope: bool = False) -> (int, str):
+                          search_scope: bool = False,
+                          pool: str = "",
+                          profile: str = "") -> (int, str):
         """
             Create a new repository on the preferred server.
+            If a pool is given, the repository borrows its objects
+            from that object pool (git alternates).  If a profile is
+            given, the git-server applies its config before the new
+            repository becomes visible.
 
             :param repo: str
             :param search_scope: bool (default: false)
+            :param pool: str (default: "")
+            :param profile: str (default: "")
             :return: int (exit_code), str (list of repos)
         """
         server = ""
@@ -430,9 +1379,20 @@ class GitServer(object):
                        f"for create on '{server}'")
             if self.__valid_repo_name(repo):
                 self.debug(f"repo name is valid: '{repo}'")
-                cmd = f"create --repo {repo}"
-                return self.ssh_runner(server=server, command=cmd)
-            else:
+                if repo.startswith(POOL_PREFIX):
+                    return EXIT_ERROR_CREATE_REPO_INVALID, \
+                        f"{repo} is reserved for object pools"
+                exit_code, stdout = self.__pool_option(pool)
+                if exit_code != 0:
+                    return exit_code, stdout
+                cmd = f"create --repo {repo}{stdout}"
+                exit_code, stdout = self.__profile_options(profile)
+                if exit_code != 0:
+                    return exit_code, stdout
+                cmd += stdout
+                return self.__mutation_runner(server=server, command=cmd,
+                                              repos=[repo])
+            else:
                 self.debug(f"repo name is not valid: '{repo}'")
                 return EXIT_ERROR_CREATE_REPO_INVALID, f"{repo} is not valid"
         except Exception as e:
@@ -463,8 +1423,12 @@ class GitServer(object):
                        f"for delete on '{server}'")
             if self.__valid_repo_name(repo):
                 self.debug(f"repo name is valid: '{repo}'")
+                exit_code, stdout = self.__pool_unused(server, repo)
+                if exit_code != 0:
+                    return exit_code, stdout
                 cmd = f"delete {repo}"
-                return self.ssh_runner(server=server, command=cmd)
+                return self.__mutation_runner(server=server, command=cmd,
+                                              repos=[repo])
             else:
                 self.debug(f"repo name is not valid: '{repo}'")
                 return EXIT_ERROR_DELETE_REPO_INVALID, f"{repo} is not valid"
@@ -489,7 +1453,7 @@ class GitServer(object):
             if exit_code == 0:
                 repo_list = ""
                 header = "repositories on {server}"
-                base_path = "/git/repos/"
+                base_path = REPO_BASE_PATH
                 name_width = 0
                 path_width = 0
                 repos = {}
@@ -505,9 +1469,18 @@ class GitServer(object):
                         path_width = len(repos[name]["path"])
                 width = len(header)
                 repo_list = ""
+                mirrors = {m["repo"]: m
+                           for m in self.__load_mirrors(server).values()}
+                now = time()
 
                 for name, value in repos.items():
                     line = f"| {value['name']} | {value['path']} |"
+                    if name in mirrors and mirrors[name]["last_sync"] > 0:
+                        last_sync = datetime.fromtimestamp(
+                            mirrors[name]["last_sync"])
+                        lag = self.format_age(now - mirrors[name]["last_sync"])
+                        line += f" last-sync: {last_sync:%Y-%m-%d %H:%M} " \
+                                f"lag: {lag} |"
                     if len(line) > width:
                         width = len(line)
                     repo_list += line + "\n"
@@ -526,15 +1499,164 @@ class GitServer(object):
             return EXIT_ERROR_LIST_REPOS_EXCEPTION, \
                 f"Error: could not list repositories. {e}"
 
-    def proxy(self, repo: str, search_scope: bool = False) -> (int, str):
+    @staticmethod
+    def parse_age(age: str) -> int:
+        """
+            Parse an age such as 365d, 12w, 6h, 30m or 90s to seconds.
+
+            :param age: str
+            :return: int (seconds)
+        """
+        units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+        age = age.strip().lower()
+        if age[-1:] in units:
+            return int(age[:-1]) * units[age[-1]]
+        return int(age) * units["d"]
+
+    @staticmethod
+    def parse_size(size: str) -> int:
+        """
+            Parse a size such as 1g, 500m, 64k or 1024 to bytes.
+
+            :param size: str
+            :return: int (bytes)
+        """
+        units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+        size = size.strip().lower().rstrip("b")
+        if size[-1:] in units:
+            return int(float(size[:-1]) * units[size[-1]])
+        return int(size)
+
+    @staticmethod
+    def format_size(size: int) -> str:
+        """
+            Render a size in bytes in human readable form (e.g. 1.2G).
+
+            :param size: int
+            :return: str
+        """
+        for unit in ("B", "K", "M", "G"):
+            if size < 1024:
+                return f"{size:.0f}{unit}" if unit == "B" \
+                    else f"{size:.1f}{unit}"
+            size /= 1024
+        return f"{size:.1f}T"
+
+    def __load_index(self, server: str, refresh: bool) -> (int, dict):
+        """
+            Return the repository metadata index of a server, as columns
+            ({column: [values]}).  The index is rebuilt from a single
+            bulk 'list --metadata' call when it is missing, older than
+            INDEX_TTL, or a refresh is requested.  The git-server answers
+            with one tab separated line per repository:
+                name, size (bytes), pack count, last push (epoch),
+                default branch, ref count
+
+            :param server: str
+            :param refresh: bool
+            :return: int (exit_code), dict (index) or str (error)
+        """
+        path = join(self.cache_dir(server), INDEX_FILE)
+        if not refresh and isfile(path) and \
+                time() - getmtime(path) < INDEX_TTL:
+            with open(path, "r") as f:
+                return EXIT_SUCCESS, json_load(f)
+        self.debug(f"rebuilding metadata index of '{server}'")
+        exit_code, stdout = self.ssh_runner(server=server,
+                                            command=f"{CMD_LIST} --metadata")
+        if exit_code != 0:
+            return exit_code, stdout
+        index = {column: [] for column in INDEX_COLUMNS}
+        for line in stdout.split("\n"):
+            fields = line.split("\t")
+            if len(fields) != len(INDEX_COLUMNS):
+                continue
+            name, size, packs, pushed, branch, refs = fields
+            index["name"].append(name)
+            index["size"].append(int(size))
+            index["packs"].append(int(packs))
+            index["pushed"].append(int(pushed))
+            index["branch"].append(branch)
+            index["refs"].append(int(refs))
+        with open(f"{path}.tmp", "w") as f:
+            json_dump(index, f, separators=(",", ":"))
+        replace(f"{path}.tmp", path)
+        return EXIT_SUCCESS, index
+
+    def query_repositories(self, sort: str = "", older_than: str = "",
+                           larger_than: str = "", limit: int = 0,
+                           refresh: bool = False,
+                           search_scope: bool = False) -> (int, str):
+        """
+            List the repositories of the preferred server with their
+            metadata, answered from the local metadata index.  Sizes,
+            pack and ref counts sort largest first, push times oldest
+            first.
+
+            :param sort: str (name|size|packs|pushed|refs, default: "")
+            :param older_than: str (age, default: "")
+            :param larger_than: str (size, default: "")
+            :param limit: int (default: 0, unlimited)
+            :param refresh: bool (default: False)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (table)
+        """
+        try:
+            try:
+                min_age = self.parse_age(older_than) if older_than else 0
+                min_size = self.parse_size(larger_than) if larger_than \
+                    else -1
+            except ValueError as e:
+                return EXIT_ERROR_LIST_QUERY_INVALID, \
+                    f"invalid --older-than/--larger-than. {e}"
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(list): {stdout}"
+            server = stdout
+            exit_code, index = self.__load_index(server, refresh)
+            if exit_code != 0:
+                return exit_code, index
+
+            now = time()
+            rows = [i for i in range(len(index["name"]))
+                    if index["size"][i] > min_size and
+                    now - index["pushed"][i] >= min_age]
+            if sort != "":
+                rows.sort(key=lambda i: index[sort][i],
+                          reverse=sort in ("size", "packs", "refs"))
+            if limit > 0:
+                rows = rows[:limit]
+
+            width = max([len(index["name"][i]) for i in rows] + [4])
+            lines = [f"{'name':{width}}  {'size':>8}  {'packs':>5}  "
+                     f"{'last push':16}  {'refs':>6}  branch"]
+            for i in rows:
+                pushed = datetime.fromtimestamp(index["pushed"][i])
+                lines.append(f"{index['name'][i]:{width}}  "
+                             f"{self.format_size(index['size'][i]):>8}  "
+                             f"{index['packs'][i]:>5}  "
+                             f"{pushed:%Y-%m-%d %H:%M}  "
+                             f"{index['refs'][i]:>6}  "
+                             f"{index['branch'][i]}")
+            lines.append(f"{len(rows)} of {len(index['name'])} "
+                         f"repositories on {server}")
+            return EXIT_SUCCESS, "\n".join(lines)
+        except Exception as e:
+            return EXIT_ERROR_LIST_REPOS_EXCEPTION, \
+                f"Error: could not query repositories. {e}"
+
+    def proxy(self, repo: str, search_scope: bool = False,
+              pool: str = "") -> (int, str):
         """
             Clone a repository from a third-party server to the git-server
             as a proxy, which will allow for a chained interaction from the
             user/client to the git-server then up to the third-party remote
-            server.
+            server.  If a pool is given, the proxy borrows its objects from
+            that object pool (git alternates).
 
             :param repo:
             :param search_scope:
+            :param pool: str (default: "")
             :return: int (exit_code), str (list of repos)
         """
         server = ""
@@ -548,8 +1670,16 @@ class GitServer(object):
                            f"[{exit_code}]: '{stdout}'")
                 return exit_code, stdout
             server = stdout
-            cmd = f"proxy {repo}"
-            return self.ssh_runner(server=server, command=cmd)
+            exit_code, stdout = self.__pool_option(pool)
+            if exit_code != 0:
+                return exit_code, stdout
+            cmd = f"proxy {repo}{stdout}"
+            exit_code, stdout = self.ssh_runner(server=server, command=cmd)
+            if exit_code == 0:
+                mirrors = self.__load_mirrors(server)
+                mirrors[repo] = self.__new_mirror(repo)
+                self.__save_mirrors(server, mirrors)
+            return exit_code, stdout
         except Exception as e:
             return EXIT_ERROR_PROXY_REPO_EXCEPTION, \
                 f"could not proxy repository ({repo}) on '{server}'. {e}"
@@ -570,8 +1700,21 @@ class GitServer(object):
             if exit_code != 0:
                 return exit_code, stdout
             server = stdout
+            for repo in (source_repo, destination_repo):
+                if not self.__valid_repo_name(repo):
+                    self.debug(f"repo name is not valid: '{repo}'")
+                    return EXIT_ERROR_RENAME_REPO_INVALID, \
+                        f"{repo} is not valid"
+            if destination_repo.startswith(POOL_PREFIX):
+                return EXIT_ERROR_POOL_INVALID, \
+                    f"{destination_repo} is reserved for object pools"
+            exit_code, stdout = self.__pool_unused(server, source_repo)
+            if exit_code != 0:
+                return exit_code, stdout
             cmd = f"rename {source_repo} {destination_repo}"
-            return self.ssh_runner(server=server, command=cmd)
+            return self.__mutation_runner(
+                server=server, command=cmd,
+                repos=[source_repo, destination_repo])
         except Exception as e:
             return EXIT_ERROR_LIST_REPOS_EXCEPTION, \
                 f"Error: could not move/rename repository. " \
@@ -596,19 +1739,1245 @@ class GitServer(object):
             return exit_code, \
                 f"Set preferred server ('{server_name}'): failed"
 
+    def __list_repository_names(self, server: str) -> (int, list):
+        """
+            Return the names of the repositories on the given server
+            using a single listing call.  Object pools (pools/*) are
+            left out: they are managed by the git-server, so bulk
+            operations (manifest, migrate, backup, archive) only handle
+            their member repositories.
+
+            :param server: str
+            :return: int (exit_code), list (repo names) or str (error)
+        """
+        exit_code, stdout = self.ssh_runner(server=server,
+                                            command=CMD_LIST)
+        if exit_code != 0:
+            return exit_code, stdout
+        return exit_code, [name.strip()
+                           for name in stdout.split('\n')
+                           if name.strip() != ""
+                           and not name.strip().startswith(POOL_PREFIX)]
+
+    def __load_manifest(self, manifest: str) -> (int, dict):
+        """
+            Load a repository manifest (json or yaml) and return the
+            desired repositories as {name: renamed_from}.
+
+            The manifest is either a list of repositories or a mapping
+            with a 'repositories' list.  Each entry is a repo name or a
+            mapping with 'name' and an optional 'renamed_from' hint.
+
+            :param manifest: str (path)
+            :return: int (exit_code), dict (desired repos) or str (error)
+        """
+        if not isfile(manifest):
+            return EXIT_ERROR_MANIFEST_INVALID, \
+                f"manifest not found: '{manifest}'"
+        with open(manifest, "r") as f:
+            if manifest.endswith((".yaml", ".yml")):
+                try:
+                    from yaml import safe_load
+                except ImportError:
+                    return EXIT_ERROR_MANIFEST_INVALID, \
+                        "PyYAML is required for yaml manifests " \
+                        "(pip install pyyaml)"
+                data = safe_load(f)
+            else:
+                data = json_load(f)
+        if isinstance(data, dict):
+            data = data.get("repositories", [])
+        if not isinstance(data, list):
+            return EXIT_ERROR_MANIFEST_INVALID, \
+                f"manifest has no list of repositories: '{manifest}'"
+        desired = {}
+        for entry in data:
+            if isinstance(entry, str):
+                name, renamed_from = entry, ""
+            elif isinstance(entry, dict):
+                name = str(entry.get("name", ""))
+                renamed_from = str(entry.get("renamed_from", "") or "")
+            else:
+                return EXIT_ERROR_MANIFEST_INVALID, \
+                    f"invalid manifest entry: {entry}"
+            for n in (name, renamed_from):
+                if n != "" and not self.__valid_repo_name(n):
+                    return EXIT_ERROR_MANIFEST_INVALID, f"{n} is not valid"
+            if name == "":
+                return EXIT_ERROR_MANIFEST_INVALID, \
+                    f"manifest entry without name: {entry}"
+            if name in desired:
+                return EXIT_ERROR_MANIFEST_INVALID, \
+                    f"duplicate manifest entry: {name}"
+            desired[name] = renamed_from
+        return EXIT_SUCCESS, desired
+
+    @staticmethod
+    def plan_manifest(desired: dict, current: list) -> list:
+        """
+            Compute the minimal plan reconciling the desired repos
+            ({name: renamed_from}) with the current server listing.
+
+            A rename is planned when the hinted source exists and the
+            target does not.  Everything else desired but missing is
+            created, and everything present but not desired (and not
+            consumed by a rename) is deleted.  Object pools (pools/*)
+            are managed by the git-server and never planned.
+
+            :param desired: dict
+            :param current: list
+            :return: list of (action, repo, source)
+        """
+        existing = set(r for r in current if not r.startswith(POOL_PREFIX))
+        renamed = set()
+        plan = []
+        for name, renamed_from in sorted(desired.items()):
+            if name in existing:
+                continue
+            if renamed_from in existing and renamed_from not in desired \
+                    and renamed_from not in renamed:
+                renamed.add(renamed_from)
+                plan.append((PLAN_RENAME, name, renamed_from))
+            else:
+                plan.append((PLAN_CREATE, name, ""))
+        for name in sorted(existing):
+            if name not in desired and name not in renamed:
+                plan.append((PLAN_DELETE, name, ""))
+        return plan
+
+    @staticmethod
+    def format_plan(plan: list) -> str:
+        """
+            Render a manifest plan, one operation per line.
+
+            :param plan: list of (action, repo, source)
+            :return: str
+        """
+        if len(plan) == 0:
+            return "manifest plan: no changes"
+        lines = [f"manifest plan: {len(plan)} change(s)"]
+        for action, repo, source in plan:
+            if action == PLAN_RENAME:
+                lines.append(f"  {action:7} {source} -> {repo}")
+            else:
+                lines.append(f"  {action:7} {repo}")
+        return "\n".join(lines)
+
+    def __apply_plan_item(self, item: tuple,
+                          search_scope: bool = False) -> (int, str):
+        """
+            Apply a single manifest plan operation.
+
+            :param item: tuple (action, repo, source)
+            :param search_scope: bool
+            :return: int (exit_code), str (stdout)
+        """
+        action, repo, source = item
+        if action == PLAN_RENAME:
+            return self.rename(source_repo=source,
+                               destination_repo=repo,
+                               search_scope=search_scope)
+        elif action == PLAN_CREATE:
+            return self.create_repository(repo=repo,
+                                          search_scope=search_scope)
+        else:
+            return self.delete_repository(repo=repo,
+                                          search_scope=search_scope)
+
+    def apply_manifest(self, manifest: str, plan_only: bool = False,
+                       jobs: int = DEFAULT_JOBS,
+                       search_scope: bool = False) -> (int, str):
+        """
+            Reconcile the preferred server against a repository
+            manifest.  The server is listed once, and the resulting
+            plan is applied with at most 'jobs' concurrent operations.
+            Renames are applied before creates and deletes so that a
+            new repo may reuse a name freed by a rename.
+
+            :param manifest: str (path)
+            :param plan_only: bool (default: False)
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (plan and per-item results)
+        """
+        try:
+            exit_code, stdout = self.__load_manifest(manifest)
+            if exit_code != 0:
+                return exit_code, stdout
+            desired = stdout
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(apply-manifest): {stdout}"
+            server = stdout
+            exit_code, current = self.__list_repository_names(server)
+            if exit_code != 0:
+                return exit_code, current
+            plan = self.plan_manifest(desired, current)
+            self.debug(f"manifest plan has {len(plan)} operation(s) "
+                       f"against {len(current)} repo(s) on '{server}'")
+            output = [self.format_plan(plan)]
+            if plan_only or len(plan) == 0:
+                return EXIT_SUCCESS, "\n".join(output)
+
+            phases = [
+                [i for i in plan if i[0] == PLAN_RENAME],
+                [i for i in plan if i[0] != PLAN_RENAME],
+            ]
+            failures = 0
+            output.append("results:")
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                for phase in phases:
+                    results = pool.map(
+                        lambda i: self.__apply_plan_item(i, search_scope),
+                        phase)
+                    for (action, repo, source), (code, out) in \
+                            zip(phase, results):
+                        target = f"{source} -> {repo}" if source else repo
+                        if code == 0:
+                            output.append(f"  [ok]     {action:7} {target}")
+                        else:
+                            failures += 1
+                            output.append(f"  [failed] {action:7} {target} "
+                                          f"({code}): {out}")
+            if failures > 0:
+                output.append(f"{failures} of {len(plan)} operation(s) "
+                              "failed")
+                return EXIT_ERROR_MANIFEST_APPLY_FAILED, "\n".join(output)
+            return EXIT_SUCCESS, "\n".join(output)
+        except Exception as e:
+            return EXIT_ERROR_MANIFEST_EXCEPTION, \
+                f"could not apply manifest ({manifest}). {e}"
+
+    @staticmethod
+    def cache_dir(server: str) -> str:
+        """
+            Return (and create) the local cache directory of a server.
+
+            :param server: str
+            :return: str (path)
+        """
+        path = join(expanduser(CACHE_DIR), server)
+        makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def __url_host(url: str) -> str:
+        """
+            Return the host portion of a git url
+            (ssh://, https://, or scp-like user@host:path).
+
+            :param url: str
+            :return: str
+        """
+        if "://" in url:
+            host = url.split("://", 1)[1].split("/", 1)[0]
+        else:
+            host = url.split(":", 1)[0]
+        return host.split("@")[-1].split(":")[0]
+
+    @staticmethod
+    def proxy_repo_name(url: str) -> str:
+        """
+            Return the name the git-server gives a proxied repository,
+            which is the upstream path without a trailing '.git'.
+
+            :param url: str
+            :return: str
+        """
+        if "://" in url:
+            path = url.split("://", 1)[1].split("/", 1)[-1]
+        else:
+            path = url.split(":", 1)[-1]
+        path = path.strip("/")
+        return path[:-4] if path.endswith(".git") else path
+
+    def __new_mirror(self, url: str) -> dict:
+        """
+            Return the refresh state of a freshly proxied repository.
+
+            :param url: str
+            :return: dict
+        """
+        now = time()
+        return {
+            "repo": self.proxy_repo_name(url),
+            "host": self.__url_host(url),
+            "refs": "",
+            "interval": MIRROR_DEFAULT_INTERVAL,
+            "next_due": now + MIRROR_DEFAULT_INTERVAL,
+            "last_sync": now,
+            "last_change": now,
+            "failures": 0,
+            "last_error": ""
+        }
+
+    def __load_mirrors(self, server: str) -> dict:
+        """
+            Load the refresh state of the proxied repositories
+            on a server as {upstream url: state}.
+
+            :param server: str
+            :return: dict
+        """
+        path = join(self.cache_dir(server), MIRROR_STATE_FILE)
+        if not isfile(path):
+            return {}
+        with open(path, "r") as f:
+            return json_load(f)
+
+    def __save_mirrors(self, server: str, mirrors: dict) -> None:
+        """
+            Atomically save the refresh state of the proxied repositories.
+
+            :param server: str
+            :param mirrors: dict
+            :return: None
+        """
+        path = join(self.cache_dir(server), MIRROR_STATE_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json_dump(mirrors, f, indent=2, sort_keys=True)
+        replace(f"{path}.tmp", path)
+
+    def __discover_mirrors(self, server: str, mirrors: dict) -> None:
+        """
+            Merge the proxied repositories known to the server
+            ('<repo>\\t<upstream url>' per line) into the refresh state,
+            so that proxies created from other hosts are refreshed too.
+            Newly discovered proxies are due at once; proxies the server
+            no longer has are dropped.  The local state is kept as is
+            if the server cannot list its proxies.
+
+            :param server: str
+            :param mirrors: dict (updated in place)
+            :return: None
+        """
+        exit_code, stdout = self.ssh_runner(server=server,
+                                            command=SERVER_CMD_PROXIES)
+        if exit_code != 0:
+            self.debug(f"refresh: could not list proxies on '{server}' "
+                       f"[{exit_code}]: '{stdout}'")
+            return
+        proxies = {}
+        for line in stdout.split("\n"):
+            if "\t" in line:
+                repo, url = line.split("\t", 1)
+                proxies[url.strip()] = repo.strip()
+        for url in list(mirrors):
+            if url not in proxies:
+                self.debug(f"refresh: '{url}' is no longer proxied")
+                del mirrors[url]
+        for url, repo in proxies.items():
+            if url not in mirrors:
+                self.debug(f"refresh: discovered '{url}' ({repo})")
+                mirrors[url] = self.__new_mirror(url)
+                mirrors[url].update(repo=repo, next_due=0, last_sync=0)
+
+    @staticmethod
+    def format_age(seconds: float) -> str:
+        """
+            Render a duration in seconds as a short age (e.g. 3h12m).
+
+            :param seconds: float
+            :return: str
+        """
+        seconds = int(max(0, seconds))
+        if seconds < 60:
+            return f"{seconds}s"
+        if seconds < 3600:
+            return f"{seconds // 60}m"
+        if seconds < 86400:
+            return f"{seconds // 3600}h{(seconds % 3600) // 60:02}m"
+        return f"{seconds // 86400}d{(seconds % 86400) // 3600:02}h"
+
+    def __refresh_mirror(self, server: str, url: str, mirror: dict,
+                         host_limit: Semaphore) -> dict:
+        """
+            Refresh a single proxied repository.  The upstream refs are
+            compared with the last seen refs (git ls-remote) so that the
+            git-server only fetches when the upstream actually changed.
+            If the upstream cannot be reached from here, the git-server
+            is asked to fetch anyway, and the interval is kept as is
+            since there is no sign of whether the upstream changed.
+
+            :param server: str
+            :param url: str
+            :param mirror: dict (current state)
+            :param host_limit: Semaphore (per upstream host)
+            :return: dict (new state)
+        """
+        mirror = dict(mirror)
+        now = time()
+        with host_limit:
+            exit_code, refs = self.runner(f"git ls-remote {quote(url)}")
+            digest = sha256(refs.encode()).hexdigest() \
+                if exit_code == 0 else ""
+            if digest != "" and digest == mirror.get("refs", ""):
+                self.debug(f"refresh: '{url}' unchanged")
+                changed = False
+            else:
+                exit_code, stdout = self.ssh_runner(
+                    server=server, command=f"{CMD_REFRESH} {quote(url)}")
+                if exit_code != 0:
+                    mirror["failures"] = mirror.get("failures", 0) + 1
+                    mirror["last_error"] = f"({exit_code}) {stdout}"
+                    backoff = MIRROR_MIN_INTERVAL * \
+                        2 ** min(mirror["failures"], 16)
+                    mirror["next_due"] = now + min(MIRROR_MAX_INTERVAL,
+                                                   backoff)
+                    return mirror
+                if digest == "":
+                    changed = None
+                else:
+                    changed = True
+                    mirror["refs"] = digest
+                    mirror["last_change"] = now
+        # Adapt the interval to how often the upstream changes: poll
+        # twice as often after a change, half as often after none.
+        interval = mirror.get("interval", MIRROR_DEFAULT_INTERVAL)
+        if changed is not None:
+            interval = interval // 2 if changed else interval * 2
+        mirror["interval"] = max(MIRROR_MIN_INTERVAL,
+                                 min(MIRROR_MAX_INTERVAL, interval))
+        mirror["next_due"] = now + mirror["interval"]
+        mirror["last_sync"] = now
+        mirror["failures"] = 0
+        mirror["last_error"] = ""
+        return mirror
+
+    def refresh(self, force: bool = False, jobs: int = DEFAULT_JOBS,
+                host_jobs: int = DEFAULT_HOST_JOBS,
+                search_scope: bool = False) -> (int, str):
+        """
+            Incrementally refresh the proxied repositories on the
+            preferred server which are due (or all, if forced), with
+            at most 'jobs' refreshes overall and 'host_jobs' per
+            upstream host.  Intended to be run periodically (cron).
+
+            :param force: bool (default: False)
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param host_jobs: int (default: DEFAULT_HOST_JOBS)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-mirror results)
+        """
+        try:
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(refresh): {stdout}"
+            server = stdout
+            mirrors = self.__load_mirrors(server)
+            self.__discover_mirrors(server, mirrors)
+            now = time()
+            due = sorted(url for url, mirror in mirrors.items()
+                         if force or mirror.get("next_due", 0) <= now)
+            self.debug(f"refresh: {len(due)} of {len(mirrors)} "
+                       f"proxied repo(s) due on '{server}'")
+            if len(due) == 0:
+                self.__save_mirrors(server, mirrors)
+                return EXIT_SUCCESS, "refresh: nothing due"
+            host_limits = {}
+            for url in due:
+                host = mirrors[url].get("host", self.__url_host(url))
+                if host not in host_limits:
+                    host_limits[host] = Semaphore(max(1, host_jobs))
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                results = pool.map(
+                    lambda url: self.__refresh_mirror(
+                        server, url, mirrors[url],
+                        host_limits[mirrors[url].get(
+                            "host", self.__url_host(url))]),
+                    due)
+                for url, mirror in zip(due, results):
+                    mirrors[url] = mirror
+            self.__save_mirrors(server, mirrors)
+            failures = 0
+            output = []
+            for url in due:
+                mirror = mirrors[url]
+                next_in = self.format_age(mirror["next_due"] - now)
+                if mirror["failures"] == 0:
+                    output.append(f"  [ok]     {url} (next in {next_in})")
+                else:
+                    failures += 1
+                    output.append(f"  [failed] {url} (retry in {next_in})"
+                                  f": {mirror['last_error']}")
+            if failures > 0:
+                return EXIT_ERROR_REFRESH_FAILED, "\n".join(output)
+            return EXIT_SUCCESS, "\n".join(output)
+        except Exception as e:
+            return EXIT_ERROR_REFRESH_EXCEPTION, \
+                f"could not refresh proxied repositories. {e}"
+
+    def grep_all(self, pattern: str, prefix: str = "",
+                 rev: str = DEFAULT_REV,
+                 max_per_repo: int = DEFAULT_MAX_PER_REPO,
+                 limit: int = 0,
+                 search_scope: bool = False) -> (int, str):
+        """
+            Search the content of every repository on the preferred
+            server (optionally only those starting with prefix).  The
+            git-server runs 'git grep' across its bare repositories in
+            parallel, and matches ('<repo>:<path>:<line>:<text>') are
+            printed as they arrive.  The search stops early once 'limit'
+            matches have been printed.
+
+            :param pattern: str
+            :param prefix: str (default: "")
+            :param rev: str (default: HEAD)
+            :param max_per_repo: int (default: DEFAULT_MAX_PER_REPO)
+            :param limit: int (default: 0, unlimited)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (summary)
+        """
+        try:
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(grep-all): {stdout}"
+            server = stdout
+            cmd = f"{CMD_GREP_ALL} --rev {quote(rev)}"
+            if prefix != "":
+                cmd += f" --prefix {quote(prefix)}"
+            if max_per_repo > 0:
+                cmd += f" --max-per-repo {max_per_repo}"
+            cmd += f" -- {quote(pattern)}"
+            # quoted twice: once for the local shell, once for the remote.
+            cmd = quote(cmd)
+
+            per_repo = {}
+            matches = [0]
+
+            def on_line(line: str) -> bool:
+                repo = line.split(":", 1)[0]
+                per_repo[repo] = per_repo.get(repo, 0) + 1
+                if 0 < max_per_repo < per_repo[repo]:
+                    return True
+                print(line, flush=True)
+                matches[0] += 1
+                return limit <= 0 or matches[0] < limit
+
+            exit_code, stderr = self.ssh_stream(server=server,
+                                                command=cmd,
+                                                on_line=on_line)
+            if exit_code == 255:
+                return 255, "connection failed (unauthorized)"
+            # 'git grep' exits 1 when nothing matched.
+            if exit_code not in (0, 1):
+                return exit_code, stderr
+            return EXIT_SUCCESS, f"{matches[0]} match(es) " \
+                                 f"in {len(per_repo)} repo(s)"
+        except Exception as e:
+            return EXIT_ERROR_GREP_EXCEPTION, \
+                f"could not search repositories ({pattern}). {e}"
+
+    def __migrate_repo(self, source: str, destination: str, repo: str,
+                       known_tips: dict,
+                       guard: bool = False) -> (int, str, dict):
+        """
+            Mirror a single repository from the source server to the
+            destination server and verify that the ref tips (refs/*)
+            match.
+            The source server pushes directly to the destination when
+            it supports it; otherwise the push is relayed through a
+            temporary local mirror.  If guarded (the repository already
+            existed on the destination), a destination with other refs
+            is not overwritten.
+
+            :param source: str
+            :param destination: str
+            :param repo: str
+            :param known_tips: dict (tips already migrated, or None)
+            :param guard: bool (default: False)
+            :return: int (exit_code), str (status), dict (ref tips)
+        """
+        src_url = self.repo_url(source, repo)
+        dst_url = self.repo_url(destination, repo)
+        exit_code, src_tips = self.ref_tips(source, repo)
+        if exit_code != 0:
+            return exit_code, f"could not read source refs. {src_tips}", {}
+        # HEAD is not carried over by a mirror push; compare refs/* only
+        src_tips = self.own_refs(src_tips)
+        if src_tips == known_tips:
+            return EXIT_SUCCESS, "up to date", src_tips
+        if len(src_tips) == 0:
+            return EXIT_SUCCESS, "empty", src_tips
+        if guard:
+            exit_code, dst_tips = self.ref_tips(destination, repo)
+            if exit_code != 0:
+                return exit_code, \
+                    f"could not read destination refs. {dst_tips}", {}
+            dst_tips = self.own_refs(dst_tips)
+            if dst_tips == src_tips:
+                return EXIT_SUCCESS, "up to date", src_tips
+            if len(dst_tips) > 0:
+                return EXIT_ERROR_MIGRATE_FAILED, \
+                    "destination refs differ, not overwritten " \
+                    "(use --force)", {}
+
+        exit_code, stdout = self.ssh_runner(
+            server=source,
+            command=f"{SERVER_CMD_MIRROR_PUSH} {repo} {quote(dst_url)}")
+        how = "direct"
+        if exit_code != 0:
+            self.debug(f"direct mirror push of '{repo}' failed "
+                       f"[{exit_code}]: '{stdout}', relaying locally")
+            how = "relayed"
+            with TemporaryDirectory(prefix="git-migrate-") as tmp:
+                mirror = join(tmp, "mirror.git")
+                exit_code, stdout = self.remote_git(
+                    source,
+                    f"clone --quiet --mirror {quote(src_url)} "
+                    f"{quote(mirror)}")
+                if exit_code == 0:
+                    exit_code, stdout = self.remote_git(
+                        destination,
+                        f"-C {quote(mirror)} push --quiet --mirror "
+                        f"{quote(dst_url)}")
+            if exit_code != 0:
+                return exit_code, f"mirror push failed. {stdout}", {}
+
+        exit_code, dst_tips = self.ref_tips(destination, repo)
+        if exit_code != 0:
+            return exit_code, \
+                f"could not read destination refs. {dst_tips}", {}
+        if self.own_refs(dst_tips) != src_tips:
+            return EXIT_ERROR_MIGRATE_FAILED, \
+                "ref tips differ after push", {}
+        return EXIT_SUCCESS, f"migrated ({how}, {len(src_tips)} refs)", \
+            src_tips
+
+    def migrate(self, destination: str, prefix: str = "",
+                jobs: int = DEFAULT_JOBS, force: bool = False,
+                search_scope: bool = False) -> (int, str):
+        """
+            Migrate the repositories on the preferred server (optionally
+            only those starting with prefix) to a destination server,
+            with at most 'jobs' repositories in flight.
+
+            The migrated ref tips are recorded per repository, so an
+            interrupted migration resumes where it stopped.  After the
+            first pass a final delta pass only pushes the repositories
+            which changed meanwhile, keeping the cutover window short.
+            Repositories which already existed on the destination (and
+            were not migrated before) are only overwritten if forced.
+
+            :param destination: str
+            :param prefix: str (default: "")
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param force: bool (default: False)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-repo results)
+        """
+        try:
+            if not self.__valid_server_name(destination):
+                return EXIT_ERROR_MIGRATE_INVALID, \
+                    f"{destination} is invalid or is one of several " \
+                    "disallowed git servers that cannot be used with " \
+                    "Git Tools"
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(migrate): {stdout}"
+            source = stdout
+            if source == destination:
+                return EXIT_ERROR_MIGRATE_INVALID, \
+                    f"source and destination are the same ({source})"
+            exit_code, repos = self.__list_repository_names(source)
+            if exit_code != 0:
+                return exit_code, repos
+            repos = [r for r in repos if r.startswith(prefix)]
+            exit_code, existing = self.__list_repository_names(destination)
+            if exit_code != 0:
+                return exit_code, existing
+            existing = set(existing)
+
+            state_file = join(self.cache_dir(source),
+                              f"migrate-{destination}.json")
+            state = {}
+            if isfile(state_file):
+                with open(state_file, "r") as f:
+                    state = json_load(f)
+
+            def save_state() -> None:
+                with open(f"{state_file}.tmp", "w") as f:
+                    json_dump(state, f, indent=2, sort_keys=True)
+                replace(f"{state_file}.tmp", state_file)
+
+            results = {}
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                missing = [r for r in repos if r not in existing]
+                self.debug(f"migrate: creating {len(missing)} of "
+                           f"{len(repos)} repo(s) on '{destination}'")
+                for repo, (code, out) in zip(missing, pool.map(
+                        lambda r: self.ssh_runner(
+                            server=destination,
+                            command=f"{CMD_CREATE} --repo {r}"),
+                        missing)):
+                    if code != 0:
+                        results[repo] = (code, f"create failed. {out}")
+                    else:
+                        state.pop(repo, None)
+
+                for delta_pass in ("initial", "delta"):
+                    pending = [r for r in repos
+                               if results.get(r, (0,))[0] == 0]
+                    self.debug(f"migrate: {delta_pass} pass over "
+                               f"{len(pending)} repo(s)")
+                    for repo, (code, out, tips) in zip(pending, pool.map(
+                            lambda r: self.__migrate_repo(
+                                source, destination, r, state.get(r),
+                                guard=not force and r in existing
+                                and r not in state),
+                            pending)):
+                        if code == 0:
+                            state[repo] = tips
+                            if delta_pass == "initial" or \
+                                    out != "up to date":
+                                results[repo] = (code, out)
+                        else:
+                            state.pop(repo, None)
+                            results[repo] = (code, out)
+                    save_state()
+
+            failures = 0
+            output = [f"migrate {source} -> {destination}: "
+                      f"{len(repos)} repo(s)"]
+            for repo in repos:
+                code, out = results[repo]
+                if code == 0:
+                    output.append(f"  [ok]     {repo}: {out}")
+                else:
+                    failures += 1
+                    output.append(f"  [failed] {repo} ({code}): {out}")
+            if failures > 0:
+                output.append(f"{failures} of {len(repos)} repo(s) failed; "
+                              "re-run to resume")
+                return EXIT_ERROR_MIGRATE_FAILED, "\n".join(output)
+            return EXIT_SUCCESS, "\n".join(output)
+        except Exception as e:
+            return EXIT_ERROR_MIGRATE_EXCEPTION, \
+                f"could not migrate repositories to {destination}. {e}"
+
+    def __cache_budget(self) -> int:
+        """
+            Return the disk budget (bytes) of the local reference
+            cache (core.gitToolsCacheBudget, e.g. '20g').
+
+            :return: int
+        """
+        exit_code, stdout = self.runner(
+            f"git config --type=int --get {CACHE_BUDGET_KEY}")
+        if exit_code != 0 or stdout == "":
+            return DEFAULT_CACHE_BUDGET
+        return int(stdout)
+
+    @staticmethod
+    def __dir_size(path: str) -> int:
+        """
+            Return the size (bytes) of the files below a directory.
+
+            :param path: str
+            :return: int
+        """
+        size = 0
+        for root, _, files in walk(path):
+            for name in files:
+                try:
+                    size += getsize(join(root, name))
+                except OSError:
+                    pass
+        return size
+
+    def __evict_cache(self, budget: int) -> None:
+        """
+            Evict the least recently used reference repositories until
+            the cache fits the budget.  The mtime of a repository's lock
+            file records its last use; repositories locked by another
+            job, or used since they were listed, are skipped.
+
+            :param budget: int (bytes)
+            :return: None
+        """
+        root = expanduser(CACHE_DIR)
+        entries = []
+        for path, dirs, _ in walk(root):
+            if path.endswith(".git") and isfile(join(path, "HEAD")):
+                dirs.clear()
+                try:
+                    used = getmtime(f"{path}.lock")
+                except FileNotFoundError:
+                    used = None
+                entries.append((used or 0, path, self.__dir_size(path),
+                                used))
+        total = sum(entry[2] for entry in entries)
+        self.debug(f"reference cache: {total} of {budget} bytes "
+                   f"in {len(entries)} repo(s)")
+        for _, path, size, used in sorted(entries):
+            if total <= budget:
+                break
+            # a lock file which did not exist must still be ours to create
+            try:
+                lock = open(f"{path}.lock", "x" if used is None else "a")
+            except FileExistsError:
+                self.debug(f"reference cache: '{path}' in use")
+                continue
+            with lock:
+                try:
+                    flock(lock, LOCK_EX | LOCK_NB)
+                except OSError:
+                    self.debug(f"reference cache: '{path}' in use")
+                    continue
+                if used is not None and getmtime(f"{path}.lock") != used:
+                    self.debug(f"reference cache: '{path}' used meanwhile")
+                    continue
+                self.debug(f"reference cache: evicting '{path}'")
+                rmtree(path, ignore_errors=True)
+                total -= size
+                flock(lock, LOCK_UN)
+
+    def clone_cached(self, repo: str, directory: str = "",
+                     search_scope: bool = False) -> (int, str):
+        """
+            Clone a repository from the preferred server using a local
+            reference repository (~/.cache/git-tools/<server>/<repo>.git).
+            The reference is created or incrementally fetched under an
+            exclusive lock, and the clone borrows its objects under a
+            shared lock (--reference --dissociate), so concurrent jobs
+            can share the cache safely.  Least recently used references
+            are evicted once the cache exceeds its disk budget.
+
+            :param repo: str
+            :param directory: str (default: "", derived from repo)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (stdout)
+        """
+        server = ""
+        try:
+            if not self.__valid_repo_name(repo):
+                return EXIT_ERROR_CLONE_CACHED_INVALID, \
+                    f"{repo} is not valid"
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(clone-cached): {stdout}"
+            server = stdout
+            url = self.repo_url(server, repo)
+            cache = join(self.cache_dir(server), f"{repo}.git")
+            makedirs(dirname(cache), exist_ok=True)
+            if directory == "":
+                directory = repo.split("/")[-1]
+
+            with open(f"{cache}.lock", "a") as lock:
+                flock(lock, LOCK_EX)
+                if isdir(cache):
+                    self.debug(f"updating reference '{cache}'")
+                    exit_code, stdout = self.remote_git(
+                        server,
+                        f"-C {quote(cache)} fetch --quiet --prune origin")
+                else:
+                    self.debug(f"creating reference '{cache}'")
+                    exit_code, stdout = self.remote_git(
+                        server,
+                        f"clone --quiet --mirror {quote(url)} "
+                        f"{quote(cache)}")
+                if exit_code != 0:
+                    self.debug(f"could not update reference "
+                               f"[{exit_code}]: '{stdout}'")
+                # mark the reference as used before the exclusive lock is
+                # given up, so that eviction sees it in use
+                utime(f"{cache}.lock")
+                flock(lock, LOCK_SH)
+                exit_code, stdout = self.remote_git(
+                    server,
+                    f"clone --reference-if-able {quote(cache)} "
+                    f"--dissociate {quote(url)} {quote(directory)}")
+                flock(lock, LOCK_UN)
+            if exit_code != 0:
+                return exit_code, stdout
+
+            self.__evict_cache(self.__cache_budget())
+            return EXIT_SUCCESS, f"cloned {repo} into {directory}"
+        except Exception as e:
+            return EXIT_ERROR_CLONE_CACHED_EXCEPTION, \
+                f"could not clone repository ({repo}) from '{server}'. {e}"
+
+    def __backup_repo(self, server: str, directory: str, repo: str,
+                      backup: dict) -> (int, str, dict):
+        """
+            Back up a single repository as an incremental bundle.  The
+            server's ref tips are compared with the last backup first,
+            so unchanged repositories cost a single ls-remote.  Changed
+            repositories are fetched into a local mirror and bundled
+            from the previously backed up tips onwards.  The bundles
+            only carry new objects; the complete ref list is recorded
+            in the manifest ("tips") and recreated on restore.
+
+            :param server: str
+            :param directory: str
+            :param repo: str
+            :param backup: dict (last backup of the repo, or None)
+            :return: int (exit_code), str (status), dict (new backup)
+        """
+        url = self.repo_url(server, repo)
+        exit_code, tips = self.ref_tips(server, repo)
+        if exit_code != 0:
+            return exit_code, f"could not read refs. {tips}", backup
+        backup = dict(backup or {"tips": {}, "bundles": []})
+        if tips == backup["tips"]:
+            return EXIT_SUCCESS, "unchanged", backup
+
+        mirror = join(directory, "mirrors", f"{repo}.git")
+        if isdir(mirror):
+            exit_code, stdout = self.remote_git(
+                server,
+                f"-C {quote(mirror)} fetch --quiet --prune origin")
+        else:
+            makedirs(dirname(mirror), exist_ok=True)
+            exit_code, stdout = self.remote_git(
+                server,
+                f"clone --quiet --mirror {quote(url)} {quote(mirror)}")
+        if exit_code != 0:
+            return exit_code, f"could not fetch. {stdout}", backup
+
+        bundle = join("bundles", repo, f"{len(backup['bundles']):04}.bundle")
+        makedirs(dirname(join(directory, bundle)), exist_ok=True)
+        known = " ".join(sorted(set(backup["tips"].values())))
+        exclude = f" --not {known}" if known != "" else ""
+        exit_code, stdout = self.runner(
+            f"git -C {quote(mirror)} bundle create --quiet "
+            f"{quote(join(directory, bundle))} --all{exclude}")
+        if exit_code != 0 and exclude != "":
+            exit_code, stdout = self.runner(
+                f"git -C {quote(mirror)} rev-list --objects --all{exclude}")
+            if exit_code == 0 and stdout == "":
+                # Only refs changed (e.g. a new branch on an existing
+                # commit): the objects are in earlier bundles.
+                backup["tips"] = tips
+                return EXIT_SUCCESS, "refs updated", backup
+            # The previous tips are gone (e.g. force-pushed and pruned):
+            # fall back to a full bundle.
+            self.debug(f"incremental bundle of '{repo}' failed "
+                       f"[{exit_code}]: '{stdout}', bundling all")
+            exit_code, stdout = self.runner(
+                f"git -C {quote(mirror)} bundle create --quiet "
+                f"{quote(join(directory, bundle))} --all")
+        if exit_code != 0:
+            if len(tips) > 0:
+                return exit_code, f"could not bundle. {stdout}", backup
+        else:
+            backup["bundles"] = backup["bundles"] + [bundle]
+        backup["tips"] = tips
+        return EXIT_SUCCESS, f"bundled {bundle}", backup
+
+    def backup_all(self, directory: str, prefix: str = "",
+                   jobs: int = DEFAULT_JOBS,
+                   search_scope: bool = False) -> (int, str):
+        """
+            Incrementally back up the repositories on the preferred
+            server (optionally only those starting with prefix) to
+            git bundles in a local directory, with at most 'jobs'
+            repositories in flight.  Only repositories whose ref tips
+            changed since the last backup (manifest.json) are bundled.
+
+            :param directory: str
+            :param prefix: str (default: "")
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-repo results)
+        """
+        try:
+            directory = abspath(expanduser(directory))
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(backup-all): {stdout}"
+            server = stdout
+            exit_code, repos = self.__list_repository_names(server)
+            if exit_code != 0:
+                return exit_code, repos
+            repos = [r for r in repos if r.startswith(prefix)]
+
+            makedirs(directory, exist_ok=True)
+            manifest_file = join(directory, BACKUP_MANIFEST_FILE)
+            manifest = {"server": server, "repos": {}}
+            if isfile(manifest_file):
+                with open(manifest_file, "r") as f:
+                    manifest = json_load(f)
+
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                results = list(pool.map(
+                    lambda r: self.__backup_repo(
+                        server, directory, r, manifest["repos"].get(r)),
+                    repos))
+            output = [f"backup of {server}: {len(repos)} repo(s)"]
+            failures = 0
+            for repo, (code, out, backup) in zip(repos, results):
+                if backup is not None:
+                    manifest["repos"][repo] = backup
+                if code == 0:
+                    output.append(f"  [ok]     {repo}: {out}")
+                else:
+                    failures += 1
+                    output.append(f"  [failed] {repo} ({code}): {out}")
+            with open(f"{manifest_file}.tmp", "w") as f:
+                json_dump(manifest, f, indent=2, sort_keys=True)
+            replace(f"{manifest_file}.tmp", manifest_file)
+            if failures > 0:
+                output.append(f"{failures} of {len(repos)} repo(s) failed")
+                return EXIT_ERROR_BACKUP_FAILED, "\n".join(output)
+            return EXIT_SUCCESS, "\n".join(output)
+        except Exception as e:
+            return EXIT_ERROR_BACKUP_EXCEPTION, \
+                f"could not back up repositories to {directory}. {e}"
+
+    def __restore_repo(self, server: str, directory: str, repo: str,
+                       backup: dict, force: bool = False,
+                       search_scope: bool = False) -> (int, str):
+        """
+            Restore a single repository from its bundles: create it on
+            the server, unbundle the bundles in order into a temporary
+            repository, set its refs to the backed up ref tips and push
+            it.
+            Repositories which already have the backed up tips are
+            skipped.  Existing repositories with other refs are only
+            overwritten if forced.
+
+            :param server: str
+            :param directory: str
+            :param repo: str
+            :param backup: dict
+            :param force: bool (default: False)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (status)
+        """
+        url = self.repo_url(server, repo)
+        exit_code, tips = self.ref_tips(server, repo)
+        if exit_code == 0:
+            refs = self.own_refs(tips)
+            if refs == self.own_refs(backup["tips"]):
+                return EXIT_SUCCESS, "up to date"
+            if len(refs) > 0 and not force:
+                return EXIT_ERROR_RESTORE_FAILED, \
+                    "refs differ from the backup, not overwritten " \
+                    "(use --force)"
+        else:
+            exit_code, stdout = self.create_repository(
+                repo=repo, search_scope=search_scope)
+            if exit_code != 0:
+                return exit_code, f"could not create. {stdout}"
+        if len(backup["bundles"]) == 0:
+            return EXIT_SUCCESS, "restored (empty)"
+
+        with TemporaryDirectory(prefix="git-restore-") as tmp:
+            work = join(tmp, "restore.git")
+            exit_code, stdout = self.runner(
+                f"git init --quiet --bare {quote(work)}")
+            for bundle in backup["bundles"]:
+                if exit_code != 0:
+                    break
+                exit_code, stdout = self.runner(
+                    f"git -C {quote(work)} fetch --quiet "
+                    f"{quote(join(directory, bundle))} "
+                    f"'+refs/*:refs/*'")
+            if exit_code != 0:
+                return exit_code, f"could not unbundle. {stdout}"
+            exit_code, stdout = self.runner(
+                f"git -C {quote(work)} for-each-ref --format='%(refname)'")
+            for ref in stdout.split("\n"):
+                if ref != "" and ref not in backup["tips"]:
+                    self.runner(f"git -C {quote(work)} update-ref -d "
+                                f"{quote(ref)}")
+            for ref, sha in backup["tips"].items():
+                if not ref.startswith("refs/") or ref.endswith("^{}"):
+                    continue
+                exit_code, stdout = self.runner(
+                    f"git -C {quote(work)} update-ref {quote(ref)} {sha}")
+                if exit_code != 0:
+                    return exit_code, f"could not restore {ref}. {stdout}"
+            exit_code, stdout = self.remote_git(
+                server,
+                f"-C {quote(work)} push --quiet --mirror {quote(url)}")
+            if exit_code != 0:
+                return exit_code, f"could not push. {stdout}"
+        return EXIT_SUCCESS, f"restored ({len(backup['bundles'])} " \
+                             "bundle(s))"
+
+    def restore_all(self, directory: str, prefix: str = "",
+                    jobs: int = DEFAULT_JOBS, force: bool = False,
+                    search_scope: bool = False) -> (int, str):
+        """
+            Restore the repositories backed up by backup_all (optionally
+            only those starting with prefix) to the preferred server,
+            with at most 'jobs' repositories in flight.  Repositories
+            whose refs differ from the backup are left alone unless
+            forced.
+
+            :param directory: str
+            :param prefix: str (default: "")
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param force: bool (default: False)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-repo results)
+        """
+        try:
+            directory = abspath(expanduser(directory))
+            manifest_file = join(directory, BACKUP_MANIFEST_FILE)
+            if not isfile(manifest_file):
+                return EXIT_ERROR_RESTORE_FAILED, \
+                    f"no backup manifest found in {directory}"
+            with open(manifest_file, "r") as f:
+                manifest = json_load(f)
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(restore-all): {stdout}"
+            server = stdout
+            repos = sorted(r for r in manifest["repos"]
+                           if r.startswith(prefix))
+
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                results = list(pool.map(
+                    lambda r: self.__restore_repo(
+                        server, directory, r, manifest["repos"][r],
+                        force, search_scope),
+                    repos))
+            output = [f"restore to {server}: {len(repos)} repo(s)"]
+            failures = 0
+            for repo, (code, out) in zip(repos, results):
+                if code == 0:
+                    output.append(f"  [ok]     {repo}: {out}")
+                else:
+                    failures += 1
+                    output.append(f"  [failed] {repo} ({code}): {out}")
+            if failures > 0:
+                output.append(f"{failures} of {len(repos)} repo(s) failed")
+                return EXIT_ERROR_RESTORE_FAILED, "\n".join(output)
+            return EXIT_SUCCESS, "\n".join(output)
+        except Exception as e:
+            return EXIT_ERROR_RESTORE_EXCEPTION, \
+                f"could not restore repositories from {directory}. {e}"
+
+    def __archive_repo(self, server: str, repo: str, rev: str,
+                       path: str) -> (int, str):
+        """
+            Stream 'git archive' of a repository (tar.gz, prefixed with
+            '<repo>/') from the server into a local file, computing its
+            sha256 checksum on the way.
+
+            :param server: str
+            :param repo: str
+            :param rev: str
+            :param path: str (output file)
+            :return: int (exit_code), str (sha256 or error)
+        """
+        cmd = f"GIT_SSH_COMMAND={quote(SSH_COMMAND)} git archive " \
+              f"--remote={quote(self.repo_url(server, repo))} " \
+              f"--format=tar.gz --prefix={quote(repo + '/')} {quote(rev)}"
+        self.debug(f"command(archive): {cmd}")
+        makedirs(dirname(path), exist_ok=True)
+        digest = sha256()
+        # stderr goes to a file: a full stderr pipe would block the
+        # command while stdout is being read
+        with self.ssh_slot(server), open(path, "wb") as f, \
+                TemporaryFile() as errors:
+            process = Popen(cmd, shell=True, stdout=PIPE, stderr=errors)
+            for chunk in iter(lambda: process.stdout.read(
+                    ARCHIVE_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f.write(chunk)
+            exit_code = process.wait()
+            errors.seek(0)
+            error = errors.read().decode().strip()
+        if exit_code != 0:
+            remove(path)
+            return exit_code, error
+        return EXIT_SUCCESS, digest.hexdigest()
+
+    def archive_all(self, out: str, prefix: str = "",
+                    rev: str = DEFAULT_REV, jobs: int = DEFAULT_JOBS,
+                    checksums: str = "",
+                    search_scope: bool = False) -> (int, str):
+        """
+            Export 'git archive' tarballs (tar.gz) of the repositories
+            on the preferred server (optionally only those starting with
+            prefix) at a revision, with at most 'jobs' archives in
+            flight.  The archives are streamed straight from the server,
+            without cloning.
+
+            If out is a directory, each repository is written to
+            '<out>/<repo>.tar.gz' and the checksums to '<out>/SHA256SUMS'.
+            If out is '-', the archives are concatenated on stdout as
+            they complete (extract with 'tar -xzi') and the checksums
+            are written to stderr.  A checksums file overrides either.
+
+            :param out: str (directory or '-')
+            :param prefix: str (default: "")
+            :param rev: str (default: HEAD)
+            :param jobs: int (default: DEFAULT_JOBS)
+            :param checksums: str (default: "", path of the checksums)
+            :param search_scope: bool (default: False)
+            :return: int (exit_code), str (per-repo results)
+        """
+        try:
+            exit_code, stdout = self.__get_server(search_scope)
+            if exit_code != 0:
+                return exit_code, f"(archive-all): {stdout}"
+            server = stdout
+            exit_code, repos = self.__list_repository_names(server)
+            if exit_code != 0:
+                return exit_code, repos
+            repos = [r for r in repos if r.startswith(prefix)]
+
+            to_stdout = out == "-"
+            # only stdout mode spools the archives in a temporary directory
+            with TemporaryDirectory(prefix="git-archive-") if to_stdout \
+                    else nullcontext(abspath(expanduser(out))) as directory:
+                paths = {r: join(directory, f"{r}.tar.gz") for r in repos}
+                output_lock = Lock()
+                results = {}
+                with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                    futures = {pool.submit(self.__archive_repo, server, r,
+                                           rev, paths[r]): r
+                               for r in repos}
+                    for future in as_completed(futures):
+                        repo = futures[future]
+                        results[repo] = future.result()
+                        if to_stdout and results[repo][0] == 0:
+                            with output_lock, open(paths[repo], "rb") as f:
+                                copyfileobj(f, std_out.buffer)
+                            std_out.buffer.flush()
+                            remove(paths[repo])
+
+            sums = [f"{results[r][1]}  {r}.tar.gz"
+                    for r in sorted(repos) if results[r][0] == 0]
+            if checksums == "" and to_stdout:
+                print("\n".join(sums), file=stderr)
+            else:
+                if checksums == "":
+                    checksums = join(directory, ARCHIVE_MANIFEST_FILE)
+                with open(abspath(expanduser(checksums)), "w") as f:
+                    f.write("".join(f"{line}\n" for line in sums))
+            failures = [f"  [failed] {r} ({results[r][0]}): {results[r][1]}"
+                        for r in sorted(repos) if results[r][0] != 0]
+            summary = f"archived {len(sums)} of {len(repos)} repo(s) " \
+                      f"at {rev} from {server}"
+            if len(failures) > 0:
+                return EXIT_ERROR_ARCHIVE_FAILED, \
+                    "\n".join(failures + [summary])
+            return EXIT_SUCCESS, summary
+        except Exception as e:
+            return EXIT_ERROR_ARCHIVE_EXCEPTION, \
+                f"could not archive repositories. {e}"
+
     @staticmethod
     def show_usage(error: str,
-                   ret_code: int = EXIT_UNDEFINED_ERROR) -> int:
+                   ret_code: int = EXIT_UNDEFINED_ERROR,
+                   file=None) -> int:
         """
             Show the program usage on error.
 
             :param error: str
             :param ret_code: int (default: EXIT_UNDEFINED_ERROR)
+            :param file: file (default: None, i.e. stdout)
             :return: int
         """
         if error.strip() == "":
             error = "unspecified error"
-        print(f"Error: '{error}'\n\n{help_text}\n")
+        print(f"Error: '{error}'\n\n{help_text}\n", file=file)
         return ret_code
 
     def prohibited(self,
@@ -628,7 +2997,8 @@ class GitServer(object):
             return 0
         else:
             return self.show_usage(f"{param_name} should not be provided "
-                                   f"for {self.args.command}", ret_code)
+                                   f"for {self.args.command}", ret_code,
+                                   file=self.debug_output)
 
     def required(self,
                  param_name: str,
@@ -645,7 +3015,8 @@ class GitServer(object):
         """
         if param_value == "":
             return self.show_usage(f"{param_name} must be provided "
-                                   f"for {self.args.command}", ret_code)
+                                   f"for {self.args.command}", ret_code,
+                                   file=self.debug_output)
         else:
             return 0
 
@@ -758,7 +3129,9 @@ class GitServer(object):
 
         exit_code, stdout = self.create_repository(
             repo=self.args.repo,
-            search_scope=self.args.scope)
+            search_scope=self.args.scope,
+            pool=self.args.pool.strip(),
+            profile=self.args.profile.strip())
         if exit_code != 0:
             return self.show_usage(stdout, exit_code)
         else:
@@ -819,7 +3192,18 @@ class GitServer(object):
         if exit_code != EXIT_SUCCESS:
             return exit_code
 
-        exit_code, stdout = self.list_repositories(self.args.scope)
+        if self.args.sort or self.args.older_than or \
+                self.args.larger_than or self.args.limit or \
+                self.args.refresh:
+            exit_code, stdout = self.query_repositories(
+                sort=self.args.sort,
+                older_than=self.args.older_than,
+                larger_than=self.args.larger_than,
+                limit=self.args.limit,
+                refresh=self.args.refresh,
+                search_scope=self.args.scope)
+        else:
+            exit_code, stdout = self.list_repositories(self.args.scope)
         self.debug(f"cmd_list() list_repositories() has returned {exit_code}")
         if exit_code != 0:
             return self.show_usage(stdout, exit_code)
@@ -844,9 +3228,16 @@ class GitServer(object):
             })
         if exit_code != EXIT_SUCCESS:
             return exit_code
-        #
-        # ToDo: Call the authorize command.
-        #
+
+        exit_code, stdout = self.proxy(
+            repo=self.args.repo.strip(),
+            search_scope=self.args.scope,
+            pool=self.args.pool.strip())
+        if exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
 
     def cmd_rename(self) -> int:
         """
@@ -878,6 +3269,8 @@ class GitServer(object):
 
         if exit_code != 0:
             return self.show_usage(stdout, exit_code)
+        if stdout != "":
+            print(stdout)
         return exit_code
 
     def cmd_use(self) -> int:
@@ -911,6 +3304,355 @@ class GitServer(object):
         else:
             return self.show_usage(stdout, exit_code)
 
+    def cmd_apply_manifest(self) -> int:
+        """
+            git apply-manifest <manifest> [--plan] [--jobs <n>]
+                -- reconcile the preferred git server with a declarative
+                   repository manifest (creates, deletes and renames).
+                -- with --plan, print the plan without applying it.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "manifest": self.args.manifest.strip(),
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.apply_manifest(
+            manifest=self.args.manifest.strip(),
+            plan_only=self.args.plan,
+            jobs=self.args.jobs,
+            search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_MANIFEST_APPLY_FAILED:
+            print(stdout)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_refresh(self) -> int:
+        """
+            git refresh [--force] [--jobs <n>] [--host-jobs <n>]
+                -- incrementally refresh the proxied repositories on the
+                   preferred git server which are due for a refresh.
+        """
+        exit_code = self.parameter_check(
+            required=REQUIRE_NO_PARAMETERS,
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.refresh(force=self.args.force,
+                                         jobs=self.args.jobs,
+                                         host_jobs=self.args.host_jobs,
+                                         search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_REFRESH_FAILED:
+            print(stdout)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_grep_all(self) -> int:
+        """
+            git grep-all <pattern> [--prefix <p>] [--rev <rev>]
+                -- search the content of all repositories on the
+                   preferred git server, streaming matches as found.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "pattern": self.args.pattern,
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.grep_all(
+            pattern=self.args.pattern,
+            prefix=self.args.prefix.strip(),
+            rev=self.args.rev.strip(),
+            max_per_repo=self.args.max_per_repo,
+            limit=self.args.limit,
+            search_scope=self.args.scope)
+        if exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            self.debug(stdout)
+            return exit_code
+
+    def cmd_migrate(self) -> int:
+        """
+            git migrate --to <server> [prefix] [--force]
+                -- migrate the repositories on the preferred git server
+                   (optionally only those starting with prefix) to
+                   another git server.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "server": self.args.server.strip(),
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.migrate(
+            destination=self.args.server.strip(),
+            prefix=self.args.prefix.strip(),
+            jobs=self.args.jobs,
+            force=self.args.force,
+            search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_MIGRATE_FAILED:
+            print(stdout)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_clone_cached(self) -> int:
+        """
+            git clone-cached <repo> [<directory>]
+                -- clone a repository from the preferred git server
+                   through the local reference repository cache.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "repo": self.args.repo.strip(),
+            },
+            prohibited={
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.clone_cached(
+            repo=self.args.repo.strip(),
+            directory=self.args.directory.strip(),
+            search_scope=self.args.scope)
+        if exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_queue_status(self) -> int:
+        """
+            git queue status
+                -- show the mutations queued for the preferred git server.
+        """
+        exit_code = self.parameter_check(
+            required=REQUIRE_NO_PARAMETERS,
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.queue_status(self.args.scope)
+        if exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_queue_flush(self) -> int:
+        """
+            git queue flush
+                -- send the mutations queued for the preferred git server.
+        """
+        exit_code = self.parameter_check(
+            required=REQUIRE_NO_PARAMETERS,
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.queue_flush(self.args.scope)
+        if exit_code in (0, 255, EXIT_ERROR_QUEUE_FLUSH_FAILED):
+            print(stdout)
+            return exit_code
+        else:
+            return self.show_usage(stdout, exit_code)
+
+    def cmd_profile(self) -> int:
+        """
+            git profile <repo> [<profile>]
+                -- apply a repository config profile to an existing
+                   repository, or show its config compared to the
+                   known profiles.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "repo": self.args.repo.strip(),
+            },
+            prohibited={
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.profile(
+            repo=self.args.repo.strip(),
+            profile=self.args.profile.strip(),
+            search_scope=self.args.scope)
+        if exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_backup_all(self) -> int:
+        """
+            git backup-all <directory> [--prefix <p>]
+                -- incrementally back up the repositories on the preferred
+                   git server to git bundles in a local directory.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "directory": self.args.directory.strip(),
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.backup_all(
+            directory=self.args.directory.strip(),
+            prefix=self.args.prefix.strip(),
+            jobs=self.args.jobs,
+            search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_BACKUP_FAILED:
+            print(stdout)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_restore_all(self) -> int:
+        """
+            git restore-all <directory> [--prefix <p>] [--force]
+                -- restore the repositories backed up by 'git backup-all'
+                   to the preferred git server.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "directory": self.args.directory.strip(),
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        exit_code, stdout = self.restore_all(
+            directory=self.args.directory.strip(),
+            prefix=self.args.prefix.strip(),
+            jobs=self.args.jobs,
+            force=self.args.force,
+            search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_RESTORE_FAILED:
+            print(stdout)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code)
+        else:
+            print(stdout)
+            return exit_code
+
+    def cmd_archive_all(self) -> int:
+        """
+            git archive-all [prefix] --out <directory|-> [--rev <rev>]
+                            [--checksums <file>]
+                -- export source tarballs of the repositories on the
+                   preferred git server without cloning them.
+        """
+        exit_code = self.parameter_check(
+            required={
+                "directory": self.args.directory.strip(),
+            },
+            prohibited={
+                "repo": self.args.repo.strip(),
+                "server": self.args.server.strip(),
+                "source": self.args.source.strip(),
+                "destination": self.args.destination.strip(),
+                "sshkey": self.args.sshkey.strip()
+            })
+        if exit_code != EXIT_SUCCESS:
+            return exit_code
+
+        out = self.args.directory.strip()
+        exit_code, stdout = self.archive_all(
+            out=out,
+            prefix=self.args.prefix.strip(),
+            rev=self.args.rev.strip(),
+            jobs=self.args.jobs,
+            checksums=self.args.checksums.strip(),
+            search_scope=self.args.scope)
+        if exit_code == EXIT_ERROR_ARCHIVE_FAILED:
+            print(stdout, file=self.debug_output)
+            return exit_code
+        elif exit_code != 0:
+            return self.show_usage(stdout, exit_code,
+                                   file=self.debug_output)
+        elif out != "-":
+            print(stdout)
+        return exit_code
+
     def execute(self) -> int:
         """
             execute the git commands defined in command-line arguments.
@@ -926,7 +3668,18 @@ class GitServer(object):
             CMD_LIST: self.cmd_list,
             CMD_PROXY: self.cmd_proxy,
             CMD_RENAME: self.cmd_rename,
-            CMD_USE: self.cmd_use
+            CMD_USE: self.cmd_use,
+            CMD_APPLY_MANIFEST: self.cmd_apply_manifest,
+            CMD_REFRESH: self.cmd_refresh,
+            CMD_GREP_ALL: self.cmd_grep_all,
+            CMD_MIGRATE: self.cmd_migrate,
+            CMD_CLONE_CACHED: self.cmd_clone_cached,
+            CMD_QUEUE_STATUS: self.cmd_queue_status,
+            CMD_QUEUE_FLUSH: self.cmd_queue_flush,
+            CMD_PROFILE: self.cmd_profile,
+            CMD_BACKUP_ALL: self.cmd_backup_all,
+            CMD_RESTORE_ALL: self.cmd_restore_all,
+            CMD_ARCHIVE_ALL: self.cmd_archive_all
         }
         self.debug(f"is command in vector_table? "
                    f"{self.args.command in vector_table}")